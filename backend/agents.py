@@ -1,15 +1,214 @@
+import asyncio
+import heapq
+import logging
 import os
-import json
-from typing import Optional, List, Dict
+import uuid
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, List, Dict, Mapping, Sequence
+import orjson
 from google import genai
 from opik import track, opik_context
-from models import ImpactQuest, Coordinates, ResolutionCategory, Difficulty
-from location_service import LocationService
+from models import (
+    ImpactQuest,
+    Coordinates,
+    ResolutionCategory,
+    Difficulty,
+    QuestRequest,
+    QuestSchema,
+    LocationQuestSchema
+)
+from location_service import FormattedPlace, LocationService
+from quest_cache import QuestCache, PlacesCache
+from gemini_client import (
+    ContextCache,
+    FieldCallback,
+    call_with_retry,
+    estimate_tokens,
+    gemini_slot,
+    get_client,
+    run_batch_job,
+    stream_json_object,
+    truncate_to_tokens
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever _build_prompt / _build_location_aware_prompt change so that
+# cached quests generated from an older prompt are no longer served
+PROMPT_VERSION = "v3"
+
+# JSON codec (orjson); swap these to go back to the stdlib json module
+_loads = orjson.loads
+
+
+def _dumps(obj) -> str:
+    return orjson.dumps(obj).decode()
+
+
+# Embedding model used for semantic cache lookups on user preferences
+EMBEDDING_MODEL = "text-embedding-004"
+
+# Nearby places search radius in meters
+PLACES_SEARCH_RADIUS_M = 3000
+
+# User preferences are truncated to keep prompts small
+MAX_PREFERENCES_TOKENS = 50
+
+# Static instructions, sent as the system instruction (with the one-shot
+# example) ahead of every request so Gemini's context caching can reuse them
+SYSTEM_INSTRUCTION = """You are the Community Architect AI. You turn personal resolutions into community impact quests that are location-specific, actionable within days or weeks, measurable, and address a real local need.
+Difficulty: Easy = 1-2 hours, Medium = 3-5 hours, Hard = 6+ hours or multiple sessions."""
+
+# Rough location mapping for demo: (lat_min, lat_max, lng_min, lng_max, name)
+KNOWN_CITY_BOUNDS = (
+    (7.3, 7.5, 3.8, 4.0, "Ibadan, Nigeria"),
+    (6.4, 6.6, 3.3, 3.5, "Lagos, Nigeria"),
+    (-1.3, -1.2, 36.8, 36.9, "Nairobi, Kenya"),
+)
+
+# Location names are memoized per ~100m tile
+LOCATION_NAME_DECIMALS = 3
+
+
+@lru_cache(maxsize=4096)
+def _lookup_location_name(lat: float, lng: float) -> str:
+    """Name of the known city whose bounding box contains (lat, lng)"""
+    for lat_min, lat_max, lng_min, lng_max, name in KNOWN_CITY_BOUNDS:
+        if lat_min <= lat <= lat_max and lng_min <= lng <= lng_max:
+            return name
+    return f"Location near ({lat:.2f}, {lng:.2f})"
+
+
+def _example_turns(user_text: str, model_output: Dict) -> List[genai.types.Content]:
+    """One-shot example as a user/model exchange"""
+    return [
+        genai.types.Content(role="user", parts=[genai.types.Part.from_text(text=user_text)]),
+        genai.types.Content(role="model", parts=[genai.types.Part.from_text(text=_dumps(model_output))]),
+    ]
+
+
+LOCATION_AWARE_EXAMPLE = _example_turns(
+    "Pick the best location by index and create a quest there; name it in the title.\n"
+    "Locations:\n"
+    "0. Bodija Market | Bodija, Ibadan | 4.1 (850 reviews) | store, market\n"
+    "1. Agodi Gardens | Agodi, Ibadan | 4.3 (1200 reviews) | park\n"
+    "Category: Health\n"
+    "Preferences: None",
+    {
+        "selected_location_index": 0,
+        "title": "Bodija Market Community Health Screening Day",
+        "description": "Partner with Bodija Market traders association to organize free blood pressure and diabetes screening. Set up booths near the main entrance to reach maximum shoppers. Provide health education pamphlets in local languages.",
+        "difficulty": "Medium",
+        "estimated_time": "Half day (4-5 hours)",
+        "community_benefit": "Early disease detection for 100+ community members, increased health awareness among traders",
+        "impact_metric": "Screen 100+ market visitors for hypertension and diabetes"
+    }
+)
+
+TRADITIONAL_EXAMPLE = _example_turns(
+    "Location: Ibadan, Nigeria (7.3775, 3.947)\n"
+    "Category: Environment\n"
+    "Preferences: None",
+    {
+        "title": "Clean Up Agodi Gardens Water Feature",
+        "description": "Organize a community cleanup of the pond area at Agodi Gardens. Remove plastic waste, trim overgrown vegetation around the water, and install educational signage about pollution prevention. Partner with local schools to involve youth.",
+        "difficulty": "Medium",
+        "estimated_time": "4 hours (Saturday morning)",
+        "community_benefit": "Cleaner recreational space for 500+ weekly visitors, improved water quality for local wildlife",
+        "impact_metric": "Remove 100kg of waste, restore 200 sq meters of waterfront"
+    }
+)
+
+# Fields a streamed response must contain before the stream can be cut
+LOCATION_AWARE_REQUIRED = [name for name, field in LocationQuestSchema.model_fields.items() if field.is_required()]
+TRADITIONAL_REQUIRED = [name for name, field in QuestSchema.model_fields.items() if field.is_required()]
+
+# Hardcoded quests served when both Gemini paths fail (read-only)
+FALLBACK_TEMPLATES: Mapping[ResolutionCategory, Mapping[str, str]] = MappingProxyType({
+    ResolutionCategory.ENVIRONMENT: MappingProxyType({
+        "title": "Community Park Cleanup",
+        "description": "Organize a cleanup event at a local park. Remove litter, plant flowers, and create a cleaner environment for everyone.",
+        "impact_metric": "Clean 200 sq meters of public space",
+        "estimated_time": "2-3 hours"
+    }),
+    ResolutionCategory.SOCIAL: MappingProxyType({
+        "title": "Community Meal Sharing",
+        "description": "Organize a community meal event where neighbors can share food and connect. Promote social cohesion and reduce isolation.",
+        "impact_metric": "Bring together 20+ community members",
+        "estimated_time": "3-4 hours"
+    }),
+    ResolutionCategory.EDUCATION: MappingProxyType({
+        "title": "Free Tutoring Sessions",
+        "description": "Provide free tutoring to local students in math or reading. Help improve academic performance in your community.",
+        "impact_metric": "Tutor 5-10 students for 2 weeks",
+        "estimated_time": "2 hours per week"
+    }),
+    ResolutionCategory.HEALTH: MappingProxyType({
+        "title": "Community Fitness Walk",
+        "description": "Organize weekly walking groups to promote physical activity and wellness in your community.",
+        "impact_metric": "15+ participants per walk",
+        "estimated_time": "1 hour per session"
+    })
+})
+
+# Used for categories without a dedicated template
+DEFAULT_FALLBACK_TEMPLATE: Mapping[str, str] = MappingProxyType({
+    "title": "Neighborhood Volunteer Day",
+    "description": "Organize a volunteer day with your neighbors to tackle a local need together, such as cleaning a shared space or helping elderly residents.",
+    "impact_metric": "Engage 10+ volunteers for one community project",
+    "estimated_time": "3 hours"
+})
+
+FALLBACK_COMMUNITY_BENEFIT = "Strengthens community bonds and creates positive local impact"
+
+
+class _FieldRelay:
+    """
+    Forwards streamed quest fields to a generate_quest on_field callback so
+    the client only ever holds the fields of the quest it will get
+    
+    Each Gemini stream attempt (retry, Pro -> Flash fallback) starts with a
+    reset, (None, None), if an earlier attempt already sent fields. A result
+    that wasn't streamed (cache hit, joined generation, hardcoded fallback)
+    is sent field by field once it's ready.
+    """
+    
+    def __init__(self, on_field: FieldCallback):
+        self.on_field = on_field
+        self.sent = False  # Fields sent since the last reset
+        self.streamed = False  # The last attempt streamed a complete quest
+    
+    async def __call__(self, name: str, value) -> None:
+        self.sent = True
+        await self.on_field(name, value)
+    
+    async def start_attempt(self) -> None:
+        """Called before each Gemini stream: void the fields sent so far"""
+        self.streamed = False
+        if self.sent:
+            self.sent = False
+            await self.on_field(None, None)
+    
+    async def finish(self, result: Dict) -> None:
+        """Send the final quest's fields unless its own stream already did"""
+        if self.streamed and not result.get("is_fallback"):
+            return
+        await self.start_attempt()
+        fields = result["quest"].model_dump(mode="json", include=set(QuestSchema.model_fields))
+        for name in QuestSchema.model_fields:
+            if fields.get(name) is not None:
+                await self(name, fields[name])
+
+
+class _GenerationAbandoned(Exception):
+    """Set on an in-flight generation whose leader was cancelled; a follower takes over"""
+
 
 class CommunityArchitect:
     """
     AI Agent that generates location-aware community impact quests
-    using Google Gemini 2.5 Pro with structured JSON output
+    using Google Gemini 2.5 Pro (Flash for fallbacks) with structured JSON output
     
     Now powered by Google Maps APIs for real-world location accuracy
     """
@@ -21,13 +220,30 @@ class CommunityArchitect:
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
         
-        # Initialize Gemini client (uses GEMINI_API_KEY env var automatically)
-        self.client = genai.Client()
-        self.model = "gemini-2.5-pro"  # Using latest model
+        # Shared Gemini client (uses GEMINI_API_KEY env var automatically)
+        self.client = get_client()
+        # Pro for picking among nearby places; Flash where there's nothing
+        # to reason over (category-only fallback, single candidate place)
+        self.model_pro = "gemini-2.5-pro"
+        self.model_flash = "gemini-2.5-flash"
         
         # Initialize LocationService for Google Maps integration
         self.location_service = LocationService()
-        print("✅ CommunityArchitect initialized with LocationService")
+        
+        # Exact + semantic response cache (shares commupath.db)
+        self.quest_cache = QuestCache()
+        
+        # Nearby places per ~1km tile, shared across users for an hour
+        self.places_cache = PlacesCache()
+        
+        # Static prompt prefixes (system instruction + one-shot example),
+        # stored as Gemini context caches once large enough to qualify
+        self.location_context = ContextCache(SYSTEM_INSTRUCTION, LOCATION_AWARE_EXAMPLE)
+        self.traditional_context = ContextCache(SYSTEM_INSTRUCTION, TRADITIONAL_EXAMPLE)
+        
+        # Generations in progress, by quest cache key (single-flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        logger.info("✅ CommunityArchitect initialized with LocationService")
     
     @track(
         name="generate_location_aware_quest",
@@ -38,12 +254,15 @@ class CommunityArchitect:
         self,
         coordinates: Coordinates,
         resolution_category: ResolutionCategory,
-        user_preferences: Optional[str] = None
+        user_preferences: Optional[str] = None,
+        on_field: Optional[FieldCallback] = None
     ) -> Dict:
         """
         Generate a location-specific community impact quest using Google Maps + AI
         
         Process:
+        0. Serve from the quest cache (exact key, then similar preferences);
+           identical requests already in flight share one generation
         1. Find real nearby places using Google Maps Places API
         2. AI selects best location and generates tailored quest
         3. Return quest with exact coordinates of chosen location
@@ -52,10 +271,30 @@ class CommunityArchitect:
             coordinates: GPS coordinates (user's click on map)
             resolution_category: Category of quest
             user_preferences: Optional user input
+            on_field: Optional async callback receiving (field, value) as
+                      Gemini streams each quest field (used for SSE);
+                      (None, None) voids the fields sent so far, before a
+                      retry or fallback streams its own. Results that aren't
+                      streamed (cache hits, fallbacks) are sent field by
+                      field at the end.
             
         Returns:
             Dict with quest data AND location metadata (name, address)
         """
+        relay = _FieldRelay(on_field) if on_field else None
+        result = await self._generate_quest(coordinates, resolution_category, user_preferences, relay)
+        if relay:
+            await relay.finish(result)
+        return result
+    
+    async def _generate_quest(
+        self,
+        coordinates: Coordinates,
+        resolution_category: ResolutionCategory,
+        user_preferences: Optional[str],
+        on_field: Optional[_FieldRelay]
+    ) -> Dict:
+        """generate_quest without the final field relay: caches, single-flight, generation"""
         
         # Set metadata for Opik tracking
         if opik_context.get_current_span_data():
@@ -68,27 +307,146 @@ class CommunityArchitect:
                 }
             )
         
-        print(f"\n🔍 STEP 1: Finding nearby {resolution_category.value} locations...")
-        print(f"   Search center: ({coordinates.lat:.4f}, {coordinates.lng:.4f})")
+        # Tier 1: exact match on the canonicalized request
+        input_hash = QuestCache.make_key(
+            PROMPT_VERSION,
+            resolution_category.value,
+            coordinates.lat,
+            coordinates.lng,
+            user_preferences
+        )
+        cached = await self.quest_cache.get(input_hash)
+        if cached:
+            logger.debug("⚡ Quest cache hit (exact)")
+            return self._result_from_cache(cached, cache_tier="exact")
+        
+        # Identical request already being generated: share its result. If its
+        # leader is cancelled (e.g. an SSE client disconnected), the first
+        # follower to wake up takes over the generation
+        while (inflight := self._inflight.get(input_hash)) is not None:
+            logger.debug("⏳ Joining in-flight quest generation")
+            try:
+                result = await asyncio.shield(inflight)
+            except _GenerationAbandoned:
+                continue
+            return self._copy_result(result)
         
-        # STEP 1: Find real nearby places using Google Maps
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[input_hash] = future
         try:
-            nearby_places = await self.location_service.find_nearby_places(
-                center_coords=coordinates,
-                category=resolution_category.value,
-                radius=3000,  # 3km search radius
-                max_results=5
+            result = await self._generate_quest_cached(
+                input_hash,
+                coordinates,
+                resolution_category,
+                user_preferences,
+                on_field
             )
+        except asyncio.CancelledError:
+            # A regular exception, so followers can tell it from their own
+            # cancellation and retry
+            future.set_exception(_GenerationAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Followers re-raise it; don't warn when there are none
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(input_hash, None)
+    
+    async def _generate_quest_cached(
+        self,
+        input_hash: str,
+        coordinates: Coordinates,
+        resolution_category: ResolutionCategory,
+        user_preferences: Optional[str],
+        on_field: Optional[_FieldRelay] = None
+    ) -> Dict:
+        """Semantic cache lookup, then generation (cached unless it fell back)"""
+        
+        # Start the Places lookup now so it overlaps the embedding call
+        places_task = asyncio.create_task(
+            self._find_nearby_places_cached(coordinates, resolution_category, PLACES_SEARCH_RADIUS_M)
+        )
+        try:
+            # Tier 2: similar preferences for the same category nearby
+            embedding = await self._embed_preferences(user_preferences)
+            if embedding:
+                cached = await self.quest_cache.find_similar(
+                    PROMPT_VERSION,
+                    resolution_category.value,
+                    coordinates.lat,
+                    coordinates.lng,
+                    embedding
+                )
+                if cached:
+                    logger.debug("⚡ Quest cache hit (semantic)")
+                    return self._result_from_cache(cached, cache_tier="semantic")
             
-            if nearby_places:
-                print(f"   ✅ Found {len(nearby_places)} nearby locations")
+            result = await self._generate_quest_uncached(
+                coordinates,
+                resolution_category,
+                user_preferences,
+                on_field,
+                places_task
+            )
+        finally:
+            places_task.cancel()  # No-op once it has finished
+        
+        # Only cache real Gemini generations, never the hardcoded fallback
+        if not result.get("is_fallback"):
+            await self.quest_cache.put(
+                input_hash,
+                PROMPT_VERSION,
+                resolution_category.value,
+                coordinates.lat,
+                coordinates.lng,
+                embedding,
+                self._serialize_result(result)
+            )
+        
+        return result
+    
+    async def _generate_quest_uncached(
+        self,
+        coordinates: Coordinates,
+        resolution_category: ResolutionCategory,
+        user_preferences: Optional[str],
+        on_field: Optional[_FieldRelay] = None,
+        places_task: Optional[asyncio.Task] = None
+    ) -> Dict:
+        """
+        Full generation pipeline (Places lookup + Gemini), bypassing the cache
+        `places_task` is an already started Places lookup to use, if any
+        """
+        
+        logger.debug(
+            "🔍 STEP 1: Finding nearby %s locations around (%.4f, %.4f)",
+            resolution_category.value, coordinates.lat, coordinates.lng
+        )
+        
+        # STEP 1: Find real nearby places using Google Maps
+        try:
+            if places_task is None:
+                places_task = self._find_nearby_places_cached(
+                    coordinates,
+                    resolution_category,
+                    PLACES_SEARCH_RADIUS_M
+                )
+            nearby_places = await places_task
+
+            if not nearby_places:
+                logger.info("⚠️  No nearby places found, using fallback generation")
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("✅ Found %d nearby locations", len(nearby_places))
                 for i, place in enumerate(nearby_places[:3]):
-                    print(f"      {i+1}. {place['name']} (rating: {place.get('rating', 'N/A')})")
-            else:
-                print(f"   ⚠️  No nearby places found, using fallback generation")
+                    logger.debug("   %d. %s (rating: %s)", i + 1, place.name, place.rating or 'N/A')
                 
         except Exception as e:
-            print(f"   ❌ Error finding nearby places: {e}")
+            logger.warning("❌ Error finding nearby places: %s", e)
             nearby_places = []
         
         # STEP 2: If no places found, use traditional generation
@@ -96,290 +454,551 @@ class CommunityArchitect:
             return await self._generate_quest_traditional(
                 coordinates,
                 resolution_category,
-                user_preferences
+                user_preferences,
+                on_field
             )
         
-        # STEP 3: Rank places by quality score
-        ranked_places = sorted(
+        # STEP 3: Keep the top 3 places by quality score
+        ranked_places = heapq.nlargest(
+            3,
             nearby_places,
-            key=lambda p: self.location_service.calculate_place_quality_score(p),
-            reverse=True
+            key=self.location_service.calculate_place_quality_score
         )
         
-        print(f"\n🤖 STEP 2: Generating quest with AI...")
-        print(f"   Providing AI with {len(ranked_places[:3])} location options")
+        logger.debug("🤖 STEP 2: Generating quest with AI from %d location options", len(ranked_places))
         
         # STEP 4: Build location-aware prompt
         prompt = self._build_location_aware_prompt(
-            places=ranked_places[:3],  # Top 3 locations
+            places=ranked_places,
             category=resolution_category,
             user_preferences=user_preferences
         )
+        self._log_prompt_tokens(self.location_context, prompt)
+        
+        # A single candidate leaves no location choice to reason about
+        model = self.model_pro if len(ranked_places) > 1 else self.model_flash
         
         try:
             # STEP 5: AI selects location and generates quest
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=genai.types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema={
-                        "type": "object",
-                        "properties": {
-                            "selected_location_index": {"type": "integer", "description": "Index of chosen location (0-2)"},
-                            "title": {"type": "string"},
-                            "description": {"type": "string"},
-                            "difficulty": {"type": "string", "enum": ["Easy", "Medium", "Hard"]},
-                            "impact_metric": {"type": "string"},
-                            "estimated_time": {"type": "string"},
-                            "community_benefit": {"type": "string"}
-                        },
-                        "required": ["selected_location_index", "title", "description", "difficulty", "impact_metric"]
-                    }
-                )
+            contents, config = await self._prepare_generation(
+                model, self.location_context, prompt, LocationQuestSchema
             )
+            fields = await self._generate_streaming(
+                model=model,
+                contents=contents,
+                config=config,
+                required=LOCATION_AWARE_REQUIRED,
+                on_field=on_field
+            )
+            quest_data = LocationQuestSchema.model_validate(fields)
             
-            quest_data = json.loads(response.text)
-            
-            # STEP 6: Get AI-selected location
-            selected_index = quest_data.get("selected_location_index", 0)
-            selected_index = max(0, min(selected_index, len(ranked_places) - 1))  # Bounds check
-            selected_place = ranked_places[selected_index]
-            
-            print(f"   ✅ AI selected: {selected_place['name']}")
-            print(f"   📍 Coordinates: ({selected_place['coordinates'].lat:.4f}, {selected_place['coordinates'].lng:.4f})")
-            
-            # STEP 7: Create quest with exact location
-            import uuid
-            quest_id = f"quest_{uuid.uuid4().hex[:8]}"
+            # STEP 6: Create quest at the AI-selected location
+            result = self._location_aware_result(quest_data, ranked_places, resolution_category)
+            quest = result["quest"]
             
-            quest = ImpactQuest(
-                quest_id=quest_id,
-                title=quest_data["title"],
-                description=quest_data["description"],
-                difficulty=Difficulty(quest_data["difficulty"]),
-                impact_metric=quest_data["impact_metric"],
-                location=selected_place["coordinates"],  # EXACT COORDINATES FROM GOOGLE MAPS
-                category=resolution_category,
-                estimated_time=quest_data.get("estimated_time"),
-                community_benefit=quest_data.get("community_benefit")
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "✅ AI selected: %s (%.4f, %.4f)",
+                    result['location_name'], quest.location.lat, quest.location.lng
+                )
             
             # Log to Opik
             if opik_context.get_current_span_data():
                 opik_context.update_current_span(
                     output=quest.model_dump(),
                     metadata={
-                        "quest_id": quest_id,
-                        "location_name": selected_place["name"],
-                        "location_address": selected_place.get("address"),
-                        "gemini_model": self.model,
+                        "quest_id": quest.quest_id,
+                        "location_name": result["location_name"],
+                        "location_address": result["location_address"],
+                        "gemini_model": model,
                         "google_maps_used": True
                     }
                 )
             
             # Return quest WITH location metadata
-            return {
-                "quest": quest,
-                "location_name": selected_place["name"],
-                "location_address": selected_place.get("address", ""),
-                "place_id": selected_place.get("place_id")
-            }
+            return result
             
-        except Exception as e:
-            print(f"   ❌ Error in AI generation: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ Error in AI generation, falling back to traditional generation")
             
             # Fallback to traditional generation
             return await self._generate_quest_traditional(
                 coordinates,
                 resolution_category,
-                user_preferences
+                user_preferences,
+                on_field
             )
     
     def _build_location_aware_prompt(
         self,
-        places: List[Dict],
+        places: List[FormattedPlace],
         category: ResolutionCategory,
         user_preferences: Optional[str]
-    ) -> str:
-        """Build prompt with specific nearby locations for AI to choose from"""
+    ) -> List[genai.types.Content]:
+        """
+        Build the request turn with specific nearby locations for AI to choose from
+        (sent after the LOCATION_AWARE_EXAMPLE prefix)
+        """
         
-        # Format places list for AI
+        # One line per place keeps the location list compact
         places_description = "\n".join([
-            f"{i}. **{place['name']}**"
-            f"\n   - Address: {place.get('address', 'Address unavailable')}"
-            f"\n   - Rating: {place.get('rating', 'N/A')}/5.0 ({place.get('user_ratings_total', 0)} reviews)"
-            f"\n   - Types: {', '.join(place.get('types', [])[:3])}"
+            f"{i}. {place.name} | {place.address or 'Address unavailable'}"
+            f" | {place.rating if place.rating is not None else 'N/A'} ({place.user_ratings_total} reviews)"
+            f" | {', '.join(place.types[:3])}"
             for i, place in enumerate(places)
         ])
         
-        prompt = f"""You are the Community Architect AI, an expert at creating location-specific community impact quests.
-
-**Available Real Locations** (from Google Maps):
-{places_description}
-
-**Task**: Generate a community impact quest
-**Category**: {category.value}
-**User Preferences**: {user_preferences or "None specified"}
-
-**Instructions**:
-1. SELECT ONE location from the list above (index 0, 1, or 2)
-2. Create a quest SPECIFICALLY designed for that exact location
-3. Mention the location NAME in the title
-4. Make the quest actionable, measurable, and community-focused
-5. Ensure it addresses a real need in that specific place
-
-**Example Output**:
-{{
-  "selected_location_index": 0,
-  "title": "Bodija Market Community Health Screening Day",
-  "description": "Partner with Bodija Market traders association to organize free blood pressure and diabetes screening. Set up booths near the main entrance to reach maximum shoppers. Provide health education pamphlets in local languages.",
-  "difficulty": "Medium",
-  "impact_metric": "Screen 100+ market visitors for hypertension and diabetes",
-  "estimated_time": "Half day (4-5 hours)",
-  "community_benefit": "Early disease detection for 100+ community members, increased health awareness among traders"
-}}
-
-Generate a similar quest selecting the BEST location from the options above."""
-
-        return prompt
+        prompt = (
+            "Pick the best location by index and create a quest there; name it in the title.\n"
+            f"Locations:\n{places_description}\n"
+            f"Category: {category.value}\n"
+            f"Preferences: {self._truncate_preferences(user_preferences)}"
+        )
+        
+        return [
+            genai.types.Content(role="user", parts=[genai.types.Part.from_text(text=prompt)])
+        ]
     
     async def _generate_quest_traditional(
         self,
         coordinates: Coordinates,
         resolution_category: ResolutionCategory,
-        user_preferences: Optional[str]
+        user_preferences: Optional[str],
+        on_field: Optional[_FieldRelay] = None
     ) -> Dict:
         """
         Traditional quest generation without Google Maps (fallback)
         Used when Places API is unavailable or returns no results
         """
         
-        print(f"\n⚙️  Using traditional quest generation (no nearby places)")
+        logger.debug("⚙️  Using traditional quest generation (no nearby places)")
         
         # Use original prompt builder
         prompt = self._build_prompt(coordinates, resolution_category, user_preferences)
+        self._log_prompt_tokens(self.traditional_context, prompt)
+        
+        # Reverse geocode (sync Maps client) in a thread while Gemini generates
+        location_task = asyncio.create_task(self._reverse_geocode(coordinates))
         
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=genai.types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema={
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string"},
-                            "description": {"type": "string"},
-                            "difficulty": {"type": "string", "enum": ["Easy", "Medium", "Hard"]},
-                            "impact_metric": {"type": "string"},
-                            "estimated_time": {"type": "string"},
-                            "community_benefit": {"type": "string"}
-                        },
-                        "required": ["title", "description", "difficulty", "impact_metric"]
-                    }
-                )
+            contents, config = await self._prepare_generation(
+                self.model_flash, self.traditional_context, prompt, QuestSchema
             )
+            fields = await self._generate_streaming(
+                model=self.model_flash,
+                contents=contents,
+                config=config,
+                required=TRADITIONAL_REQUIRED,
+                on_field=on_field
+            )
+            quest_data = QuestSchema.model_validate(fields)
             
-            quest_data = json.loads(response.text)
-            
-            import uuid
-            quest_id = f"quest_{uuid.uuid4().hex[:8]}"
-            
-            quest = ImpactQuest(
-                quest_id=quest_id,
-                title=quest_data["title"],
-                description=quest_data["description"],
-                difficulty=Difficulty(quest_data["difficulty"]),
-                impact_metric=quest_data["impact_metric"],
-                location=coordinates,
-                category=resolution_category,
-                estimated_time=quest_data.get("estimated_time"),
-                community_benefit=quest_data.get("community_benefit")
+            return self._traditional_result(
+                quest_data,
+                coordinates,
+                resolution_category,
+                await location_task
             )
             
-            # Try to get location name from geocoding
-            location_name = self.location_service.reverse_geocode(
+        except Exception as e:
+            location_task.cancel()
+            logger.error("❌ Traditional generation also failed, serving fallback quest: %s", e)
+            # Final fallback - use hardcoded quest
+            return self._fallback_result(coordinates, resolution_category)
+    
+    async def _reverse_geocode(self, coordinates: Coordinates) -> Optional[str]:
+        """Location name from geocoding (None if unavailable)"""
+        try:
+            return await self.location_service.reverse_geocode(
                 coordinates.lat,
                 coordinates.lng
             )
+        except Exception as e:
+            logger.warning("⚠️  Reverse geocoding failed: %s", e)
+            return None
+    
+    def _log_prompt_tokens(self, context: ContextCache, prompt: List[genai.types.Content]) -> None:
+        """Attach the locally estimated prompt size (prefix + request) to the Opik span"""
+        if opik_context.get_current_span_data():
+            opik_context.update_current_span(
+                metadata={"estimated_input_tokens": context.tokens + estimate_tokens(prompt)}
+            )
+    
+    async def _prepare_generation(
+        self,
+        model: str,
+        context: ContextCache,
+        prompt: List[genai.types.Content],
+        schema: type
+    ):
+        """
+        Contents and config for one online call -> (contents, config)
+        
+        With a live context cache only the request itself is sent;
+        otherwise the static prefix goes inline ahead of it.
+        """
+        cache_name = await context.get(model)
+        if cache_name:
+            return prompt, genai.types.GenerateContentConfig(
+                cached_content=cache_name,
+                response_mime_type="application/json",
+                response_schema=schema
+            )
+        return context.contents + prompt, self._generation_config(schema)
+    
+    def _generation_config(self, schema: type) -> genai.types.GenerateContentConfig:
+        """Structured-output config shared by the online and batch paths"""
+        return genai.types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION,
+            response_mime_type="application/json",
+            response_schema=schema
+        )
+    
+    def _location_aware_result(
+        self,
+        quest_data: LocationQuestSchema,
+        ranked_places: List[FormattedPlace],
+        resolution_category: ResolutionCategory
+    ) -> Dict:
+        """Build the quest at the place Gemini selected from `ranked_places`"""
+        # Schema bounds the index to 0-2; fewer places may have been offered
+        selected_index = min(quest_data.selected_location_index, len(ranked_places) - 1)
+        selected_place = ranked_places[selected_index]
+        
+        quest = ImpactQuest(
+            quest_id=f"quest_{uuid.uuid4().hex[:8]}",
+            title=quest_data.title,
+            description=quest_data.description,
+            difficulty=quest_data.difficulty,
+            impact_metric=quest_data.impact_metric,
+            location=selected_place.coordinates,  # EXACT COORDINATES FROM GOOGLE MAPS
+            category=resolution_category,
+            estimated_time=quest_data.estimated_time,
+            community_benefit=quest_data.community_benefit
+        )
+        
+        return {
+            "quest": quest,
+            "location_name": selected_place.name,
+            "location_address": selected_place.address,
+            "place_id": selected_place.place_id
+        }
+    
+    def _traditional_result(
+        self,
+        quest_data: QuestSchema,
+        coordinates: Coordinates,
+        resolution_category: ResolutionCategory,
+        location_name: Optional[str]
+    ) -> Dict:
+        """Build the quest at the user's coordinates (no Places data)"""
+        quest = ImpactQuest(
+            quest_id=f"quest_{uuid.uuid4().hex[:8]}",
+            title=quest_data.title,
+            description=quest_data.description,
+            difficulty=quest_data.difficulty,
+            impact_metric=quest_data.impact_metric,
+            location=coordinates,
+            category=resolution_category,
+            estimated_time=quest_data.estimated_time,
+            community_benefit=quest_data.community_benefit
+        )
+        
+        return {
+            "quest": quest,
+            "location_name": location_name or "Ibadan, Nigeria",
+            "location_address": "",
+            "place_id": None
+        }
+    
+    def _fallback_result(
+        self,
+        coordinates: Coordinates,
+        resolution_category: ResolutionCategory
+    ) -> Dict:
+        """Hardcoded quest result, used when Gemini can't be reached"""
+        return {
+            "quest": self._generate_fallback_quest(coordinates, resolution_category),
+            "location_name": "Ibadan, Nigeria",
+            "location_address": "",
+            "place_id": None,
+            "is_fallback": True
+        }
+    
+    # ==================== BATCH GENERATION ====================
+    
+    async def generate_quests_batch(self, requests: List[QuestRequest]) -> List[Dict]:
+        """
+        Generate quests for many requests through the Gemini Batch API
+        
+        Batch jobs cost about half as much as online calls and don't count
+        against the online rate limits, but can take minutes to complete, so
+        this is meant for seeding and backfills rather than user requests.
+        
+        Args:
+            requests: Quest requests to generate
             
-            return {
-                "quest": quest,
-                "location_name": location_name or "Ibadan, Nigeria",
-                "location_address": "",
-                "place_id": None
-            }
-            
+        Returns:
+            One result dict per request, in order, shaped like generate_quest's
+        """
+        if not requests:
+            return []
+        
+        logger.info("📦 Generating %d quest(s) with the Gemini Batch API", len(requests))
+        
+        prepared = await asyncio.gather(*(self._prepare_batch_request(request) for request in requests))
+        
+        try:
+            responses = await run_batch_job(
+                self.model_pro,
+                [inlined for _, inlined in prepared],
+                display_name=f"commupath-quests-{uuid.uuid4().hex[:8]}"
+            )
         except Exception as e:
-            print(f"❌ Traditional generation also failed: {e}")
-            # Final fallback - use hardcoded quest
-            fallback_quest = self._generate_fallback_quest(coordinates, resolution_category)
-            return {
-                "quest": fallback_quest,
-                "location_name": "Ibadan, Nigeria",
-                "location_address": "",
-                "place_id": None
-            }
+            logger.error("❌ Batch job failed: %s", e)
+            responses = [None] * len(requests)
+        
+        results = []
+        for request, (ranked_places, _), response in zip(requests, prepared, responses):
+            try:
+                if response is None or response.error:
+                    raise ValueError(response.error if response else "no response")
+                if ranked_places:
+                    quest_data = LocationQuestSchema.model_validate_json(response.response.text)
+                    result = self._location_aware_result(quest_data, ranked_places, request.resolution_category)
+                else:
+                    quest_data = QuestSchema.model_validate_json(response.response.text)
+                    result = self._traditional_result(
+                        quest_data,
+                        request.coordinates,
+                        request.resolution_category,
+                        await self._reverse_geocode(request.coordinates)
+                    )
+                
+                await self.quest_cache.put(
+                    QuestCache.make_key(
+                        PROMPT_VERSION,
+                        request.resolution_category.value,
+                        request.coordinates.lat,
+                        request.coordinates.lng,
+                        request.user_preferences
+                    ),
+                    PROMPT_VERSION,
+                    request.resolution_category.value,
+                    request.coordinates.lat,
+                    request.coordinates.lng,
+                    None,
+                    self._serialize_result(result)
+                )
+            except Exception as e:
+                logger.warning("⚠️  Batch item failed, using fallback quest: %s", e)
+                result = self._fallback_result(request.coordinates, request.resolution_category)
+            results.append(result)
+        
+        logger.info(
+            "✅ Batch complete: %d/%d generated",
+            sum(not r.get('is_fallback') for r in results), len(results)
+        )
+        return results
+    
+    async def _prepare_batch_request(self, request: QuestRequest):
+        """Places lookup + prompt for one batch item -> (ranked places, InlinedRequest)"""
+        try:
+            nearby_places = await self._find_nearby_places_cached(
+                request.coordinates,
+                request.resolution_category,
+                PLACES_SEARCH_RADIUS_M
+            )
+        except Exception as e:
+            logger.warning("❌ Error finding nearby places: %s", e)
+            nearby_places = []
+        
+        if nearby_places:
+            ranked_places = heapq.nlargest(
+                3,
+                nearby_places,
+                key=self.location_service.calculate_place_quality_score
+            )
+            contents = LOCATION_AWARE_EXAMPLE + self._build_location_aware_prompt(
+                ranked_places,
+                request.resolution_category,
+                request.user_preferences
+            )
+            schema = LocationQuestSchema
+        else:
+            ranked_places = []
+            contents = TRADITIONAL_EXAMPLE + self._build_prompt(
+                request.coordinates,
+                request.resolution_category,
+                request.user_preferences
+            )
+            schema = QuestSchema
+        
+        return ranked_places, genai.types.InlinedRequest(
+            contents=contents,
+            config=self._generation_config(schema)
+        )
+    
+    async def _generate_streaming(
+        self,
+        model: str,
+        contents,
+        config: genai.types.GenerateContentConfig,
+        required: List[str],
+        on_field: Optional[_FieldRelay] = None
+    ) -> Dict:
+        """
+        Stream a structured Gemini response and return the parsed fields
+        The stream is cut as soon as all `required` fields have been emitted
+        
+        Calls wait for the model's client-side rate limit and a shared
+        in-flight slot, and 429/503 responses are retried with backoff
+        instead of failing over to the fallback quest.
+        """
+        tokens = estimate_tokens(contents, config.system_instruction)
+        
+        async def attempt():
+            if on_field:
+                await on_field.start_attempt()
+            async with gemini_slot(model, tokens):
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+                fields = await stream_json_object(stream, required, on_field)
+            if on_field:
+                on_field.streamed = True
+            return fields
+        
+        return await call_with_retry(attempt)
+    
+    async def _find_nearby_places_cached(
+        self,
+        coordinates: Coordinates,
+        resolution_category: ResolutionCategory,
+        radius: int
+    ) -> Sequence[FormattedPlace]:
+        """
+        Nearby places for the ~1km tile around `coordinates`
+
+        Concurrent misses on the same tile wait on one lock, so only the
+        first request hits the Places API and the rest read its result.
+        Empty results aren't cached (they may come from a transient error).
+        """
+        key = self.places_cache.make_key(
+            coordinates.lat, coordinates.lng, resolution_category.value, radius
+        )
+
+        try:
+            async with self.places_cache.lock(key):
+                nearby_places = await self.places_cache.get(key)
+                if nearby_places is not None:
+                    logger.debug("⚡ Places cache hit")
+                    return nearby_places
+
+                nearby_places = await self.location_service.find_nearby_places(
+                    center_coords=coordinates,
+                    category=resolution_category.value,
+                    radius=radius,
+                    max_results=5
+                )
+                if nearby_places:
+                    await self.places_cache.put(key, nearby_places)
+                return nearby_places
+        finally:
+            self.places_cache.release(key)
+
+    async def _embed_preferences(self, user_preferences: Optional[str]) -> Optional[List[float]]:
+        """Embed user preferences for semantic cache lookups (None if unavailable)"""
+        if not user_preferences:
+            return None
+        
+        try:
+            response = await self.client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=user_preferences
+            )
+            return list(response.embeddings[0].values)
+        except Exception as e:
+            logger.warning("⚠️  Preference embedding failed, skipping semantic cache: %s", e)
+            return None
+    
+    def _serialize_result(self, result: Dict) -> str:
+        """Serialize a generation result (quest + location metadata) for the cache"""
+        return _dumps({
+            "quest": result["quest"].model_dump(mode="json"),
+            "location_name": result.get("location_name"),
+            "location_address": result.get("location_address"),
+            "place_id": result.get("place_id")
+        })
+    
+    def _copy_result(self, result: Dict) -> Dict:
+        """Same generation result under a fresh quest_id (quests are persisted per user)"""
+        return {
+            **result,
+            "quest": result["quest"].model_copy(update={"quest_id": f"quest_{uuid.uuid4().hex[:8]}"})
+        }
+    
+    def _result_from_cache(self, response_json: str, cache_tier: str) -> Dict:
+        """
+        Rebuild a generation result from the cache
+        Each hit gets a fresh quest_id since quests are persisted per user
+        """
+        data = _loads(response_json)
+        quest = ImpactQuest.model_validate(data["quest"]).model_copy(
+            update={"quest_id": f"quest_{uuid.uuid4().hex[:8]}"}
+        )
+        
+        if opik_context.get_current_span_data():
+            opik_context.update_current_span(
+                output=quest.model_dump(),
+                metadata={"quest_id": quest.quest_id, "cache_hit": cache_tier}
+            )
+        
+        return {
+            "quest": quest,
+            "location_name": data.get("location_name"),
+            "location_address": data.get("location_address", ""),
+            "place_id": data.get("place_id")
+        }
     
     def _build_prompt(
         self,
         coordinates: Coordinates,
         resolution_category: ResolutionCategory,
         user_preferences: Optional[str]
-    ) -> str:
-        """Build the prompt for Gemini"""
+    ) -> List[genai.types.Content]:
+        """Build the request turn for Gemini (sent after the TRADITIONAL_EXAMPLE prefix)"""
         
         # Determine location context (simulated - in production, use reverse geocoding)
         location_name = self._get_location_name(coordinates)
         
-        prompt = f"""You are the Community Architect AI, an expert at transforming personal resolutions into actionable community impact quests.
-
-Generate a specific, actionable community impact quest based on the following information:
-
-**Location**: {location_name} (Lat: {coordinates.lat}, Lng: {coordinates.lng})
-**Resolution Category**: {resolution_category.value}
-**User Preferences**: {user_preferences or "None specified"}
-
-**Requirements**:
-1. The quest MUST be location-specific and relevant to {location_name}
-2. It should address a real community need in the {resolution_category.value} category
-3. It must be actionable (user can complete it within days/weeks)
-4. Include a measurable impact metric (e.g., "Plant 50 trees", "Tutor 10 students")
-5. Specify community benefit in concrete terms
-6. Assign appropriate difficulty (Easy: 1-2 hours, Medium: 3-5 hours, Hard: 6+ hours or multiple sessions)
-
-**Example Output**:
-For Environment category in Ibadan, Nigeria:
-{{
-  "title": "Clean Up Agodi Gardens Water Feature",
-  "description": "Organize a community cleanup of the pond area at Agodi Gardens. Remove plastic waste, trim overgrown vegetation around the water, and install educational signage about pollution prevention. Partner with local schools to involve youth.",
-  "difficulty": "Medium",
-  "impact_metric": "Remove 100kg of waste, restore 200 sq meters of waterfront",
-  "estimated_time": "4 hours (Saturday morning)",
-  "community_benefit": "Cleaner recreational space for 500+ weekly visitors, improved water quality for local wildlife"
-}}
-
-Generate a similar quest for the given location and category. Be specific, realistic, and inspiring."""
-
-        return prompt
+        prompt = (
+            f"Location: {location_name} ({coordinates.lat}, {coordinates.lng})\n"
+            f"Category: {resolution_category.value}\n"
+            f"Preferences: {self._truncate_preferences(user_preferences)}"
+        )
+        
+        return [
+            genai.types.Content(role="user", parts=[genai.types.Part.from_text(text=prompt)])
+        ]
+    
+    def _truncate_preferences(self, user_preferences: Optional[str]) -> str:
+        """Cap user preferences at MAX_PREFERENCES_TOKENS"""
+        if not user_preferences:
+            return "None"
+        return truncate_to_tokens(user_preferences, MAX_PREFERENCES_TOKENS)
     
     def _get_location_name(self, coordinates: Coordinates) -> str:
         """
         Get location name from coordinates (simplified for MVP)
         In production, use Google Maps Geocoding API
         """
-        # Rough location mapping for demo
-        if 7.3 <= coordinates.lat <= 7.5 and 3.8 <= coordinates.lng <= 4.0:
-            return "Ibadan, Nigeria"
-        elif 6.4 <= coordinates.lat <= 6.6 and 3.3 <= coordinates.lng <= 3.5:
-            return "Lagos, Nigeria"
-        elif -1.3 <= coordinates.lat <= -1.2 and 36.8 <= coordinates.lng <= 36.9:
-            return "Nairobi, Kenya"
-        else:
-            return f"Location near ({coordinates.lat:.2f}, {coordinates.lng:.2f})"
+        return _lookup_location_name(
+            round(coordinates.lat, LOCATION_NAME_DECIMALS),
+            round(coordinates.lng, LOCATION_NAME_DECIMALS)
+        )
     
     def _generate_fallback_quest(
         self,
@@ -387,36 +1006,7 @@ Generate a similar quest for the given location and category. Be specific, reali
         resolution_category: ResolutionCategory
     ) -> ImpactQuest:
         """Generate a fallback quest if API fails"""
-        import uuid
-        
-        fallback_quests = {
-            ResolutionCategory.ENVIRONMENT: {
-                "title": "Community Park Cleanup",
-                "description": "Organize a cleanup event at a local park. Remove litter, plant flowers, and create a cleaner environment for everyone.",
-                "impact_metric": "Clean 200 sq meters of public space",
-                "estimated_time": "2-3 hours"
-            },
-            ResolutionCategory.SOCIAL: {
-                "title": "Community Meal Sharing",
-                "description": "Organize a community meal event where neighbors can share food and connect. Promote social cohesion and reduce isolation.",
-                "impact_metric": "Bring together 20+ community members",
-                "estimated_time": "3-4 hours"
-            },
-            ResolutionCategory.EDUCATION: {
-                "title": "Free Tutoring Sessions",
-                "description": "Provide free tutoring to local students in math or reading. Help improve academic performance in your community.",
-                "impact_metric": "Tutor 5-10 students for 2 weeks",
-                "estimated_time": "2 hours per week"
-            },
-            ResolutionCategory.HEALTH: {
-                "title": "Community Fitness Walk",
-                "description": "Organize weekly walking groups to promote physical activity and wellness in your community.",
-                "impact_metric": "15+ participants per walk",
-                "estimated_time": "1 hour per session"
-            }
-        }
-        
-        template = fallback_quests[resolution_category]
+        template = FALLBACK_TEMPLATES.get(resolution_category, DEFAULT_FALLBACK_TEMPLATE)
         
         return ImpactQuest(
             quest_id=f"quest_{uuid.uuid4().hex[:8]}",
@@ -427,5 +1017,5 @@ Generate a similar quest for the given location and category. Be specific, reali
             location=coordinates,
             category=resolution_category,
             estimated_time=template["estimated_time"],
-            community_benefit="Strengthens community bonds and creates positive local impact"
+            community_benefit=FALLBACK_COMMUNITY_BENEFIT
         )
@@ -3,18 +3,21 @@ Authentication utilities for CommuPath.
 Handles JWT token creation, password hashing, and user verification.
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+import hashlib
 import os
+import time
 
 from database import get_db
 from db_models import User
+import crud
 
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -24,6 +27,12 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Verified tokens: blake2b digest (the raw token isn't kept) -> (expires_at,
+# username); LRU-bounded. An entry never outlives the token's own exp claim.
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+_TOKEN_CACHE: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password"""
@@ -63,6 +72,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def _decode_username(token: str) -> Optional[str]:
+    """
+    Username (sub claim) of a valid token, None if it is invalid or expired
+    
+    Verified tokens are remembered for up to TOKEN_CACHE_TTL_SECONDS, so
+    repeat requests with the same token skip the signature check.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.monotonic()
+    
+    entry = _TOKEN_CACHE.get(key)
+    if entry is not None:
+        if entry[0] > now:
+            _TOKEN_CACHE.move_to_end(key)
+            return entry[1]
+        del _TOKEN_CACHE[key]
+    
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    
+    username = payload.get("sub")
+    if username is None:
+        return None
+    
+    ttl = TOKEN_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    _TOKEN_CACHE[key] = (now + ttl, username)
+    while len(_TOKEN_CACHE) > TOKEN_CACHE_MAX_ENTRIES:
+        _TOKEN_CACHE.popitem(last=False)
+    
+    return username
+
+
 async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """
     Authenticate a user by username and password.
@@ -75,8 +120,7 @@ async def authenticate_user(db: AsyncSession, username: str, password: str) -> O
     Returns:
         User object if authentication succeeds, None otherwise
     """
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
+    user = await crud.get_user_by_username(db, username)
     
     if not user:
         return None
@@ -109,16 +153,13 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = _decode_username(token)
+    if username is None:
         raise credentials_exception
     
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
+    # Always re-read the user: points/impact level must be current, and a
+    # deleted user loses access immediately
+    user = await crud.get_user_by_username(db, username)
     
     if user is None:
         raise credentials_exception
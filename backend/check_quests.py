@@ -1,35 +1,32 @@
-import sqlite3
+from database import get_conn
 
-conn = sqlite3.connect('commupath.db')
-cursor = conn.cursor()
+conn = get_conn()
 
-# Get updated quests
-cursor.execute("""
-    SELECT title, location_name, location_lat, location_lng 
-    FROM quests 
-    ORDER BY created_at DESC 
-    LIMIT 10
-""")
+# Lets ORDER BY created_at DESC LIMIT 10 seek the index instead of sorting
+conn.execute("CREATE INDEX IF NOT EXISTS idx_quests_created_at ON quests(created_at DESC)")
+conn.execute("PRAGMA query_only = 1")
+
+# Latest quests plus both counts in a single scan
+rows = conn.execute("""
+    SELECT title, location_name, location_lat, location_lng,
+           COUNT(*) OVER () AS total,
+           SUM(CASE WHEN location_name IS NOT NULL THEN 1 ELSE 0 END) OVER () AS with_names
+    FROM quests
+    ORDER BY created_at DESC
+    LIMIT ?
+""", (10,)).fetchall()
 
 print("\n📍 Latest 10 Quests:")
 print("=" * 100)
-for row in cursor.fetchall():
-    title = row[0][:45]
-    loc_name = row[1] or "No location name"
-    lat = row[2]
-    lng = row[3]
+for title, loc_name, lat, lng, _, _ in rows:
+    title = title[:45]
+    loc_name = loc_name or "No location name"
     print(f"{title:45} | {loc_name:35} | ({lat:.4f}, {lng:.4f})")
 
 print("=" * 100)
 
-# Count quests with location names
-cursor.execute("SELECT COUNT(*) FROM quests WHERE location_name IS NOT NULL")
-with_names = cursor.fetchone()[0]
-
-cursor.execute("SELECT COUNT(*) FROM quests")
-total = cursor.fetchone()[0]
+# Counts ride along on every row (window aggregates)
+total, with_names = (rows[0][4], rows[0][5]) if rows else (0, 0)
 
 print(f"\n✅ {with_names}/{total} quests have location names")
 print(f"✅ Updates complete!")
-
-conn.close()
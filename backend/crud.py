@@ -1,100 +1,395 @@
 """
 CRUD (Create, Read, Update, Delete) operations for database models.
 Async functions for interacting with Users, Quests, and QuestSubmissions.
+
+List reads (leaderboard, quest lists, submissions) use Core selects over an
+explicit column list and unpack each row tuple straight into a plain dict
+shaped like the models' to_dict(), skipping ORM object hydration for
+read-only responses.
+
+Lookups are built once at import with bindparam() placeholders, so each
+call reuses the same statement (and SQLAlchemy's compiled-SQL cache entry)
+instead of constructing a new select().
 """
 
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, desc
-from typing import List, Optional
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy import bindparam, insert, select, update, desc
+from sqlalchemy.sql import Select
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import time
 
 from db_models import User, Quest, QuestSubmission
-from auth import get_password_hash
+import auth
+
+
+# ==================== CORE READ STATEMENTS ====================
+
+_USER_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.full_name,
+    User.impact_level,
+    User.points,
+    User.completed_quests,
+    User.created_at,
+)
+
+_QUEST_COLUMNS = (
+    Quest.quest_id,
+    Quest.title,
+    Quest.description,
+    Quest.category,
+    Quest.difficulty,
+    Quest.impact_metric,
+    Quest.estimated_time,
+    Quest.community_benefit,
+    Quest.location_lat,
+    Quest.location_lng,
+    Quest.location_name,
+    Quest.location_address,
+    Quest.status,
+    Quest.created_by,
+    Quest.assigned_to,
+    Quest.created_at,
+    Quest.completed_at,
+)
+
+_SUBMISSION_COLUMNS = (
+    QuestSubmission.id,
+    QuestSubmission.quest_id,
+    QuestSubmission.user_id,
+    QuestSubmission.image_path,
+    QuestSubmission.description,
+    QuestSubmission.confidence_score,
+    QuestSubmission.verification_result,
+    QuestSubmission.ai_reasoning,
+    QuestSubmission.points_awarded,
+    QuestSubmission.submitted_at,
+)
+
+_LEADERBOARD_STMT = select(*_USER_COLUMNS).order_by(desc(User.points))
+_QUESTS_STMT = select(*_QUEST_COLUMNS)
+_SUBMISSIONS_STMT = select(*_SUBMISSION_COLUMNS)
+
+# Single-row ORM lookups
+_GET_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+_GET_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_GET_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_GET_QUEST_BY_ID = select(Quest).where(Quest.quest_id == bindparam("quest_id"))
+_GET_SUBMISSION_BY_ID = select(QuestSubmission).where(QuestSubmission.id == bindparam("submission_id"))
+
+# List lookups
+_GET_QUESTS_CREATED_BY = (
+    _QUESTS_STMT
+    .where(Quest.created_by == bindparam("user_id"))
+    .order_by(desc(Quest.created_at))
+)
+_GET_SUBMISSIONS_BY_QUEST = (
+    _SUBMISSIONS_STMT
+    .where(QuestSubmission.quest_id == bindparam("quest_id"))
+    .order_by(desc(QuestSubmission.submitted_at))
+)
+_GET_SUBMISSIONS_BY_USER = (
+    _SUBMISSIONS_STMT
+    .where(QuestSubmission.user_id == bindparam("user_id"))
+    .order_by(desc(QuestSubmission.submitted_at))
+)
+_GET_PENDING_SUBMISSIONS = (
+    select(QuestSubmission)
+    .where(QuestSubmission.verification_result == "Pending")
+    .order_by(QuestSubmission.submitted_at)
+    .limit(bindparam("limit"))
+)
+_GET_RECENT_IMAGE_HASHES = (
+    select(QuestSubmission.id, QuestSubmission.image_hash)
+    .where(QuestSubmission.submitted_at >= bindparam("since"))
+    .where(QuestSubmission.user_id != bindparam("user_id"))
+    .where(QuestSubmission.verification_result != "Rejected")
+    .where(QuestSubmission.image_hash.is_not(None))
+)
+
+# Photos whose perceptual hashes differ in at most this many of 64 bits are
+# the same picture (resaved, resized or recompressed)
+DUPLICATE_MAX_DISTANCE = 5
+# How far back another user's photo counts as a duplicate
+DUPLICATE_WINDOW = timedelta(days=30)
+_HASH_MASK = (1 << 64) - 1
+# Hashes with fewer set bits than this, or more than 64 minus it, come from
+# near-uniform photos and sit within a few bits of each other regardless of
+# content, so they aren't checked
+DUPLICATE_MIN_BITS = 8
+
+
+@lru_cache(maxsize=None)
+def _all_quests_stmt(filters: tuple) -> Select:
+    """
+    get_all_quests statement for a combination of active filters
+    
+    Built once per combination (at most 8) with bindparam placeholders, so
+    each keeps a single compiled-SQL cache entry.
+    """
+    query = _QUESTS_STMT
+    for name in filters:
+        query = query.where(getattr(Quest, name) == bindparam(name))
+    return query.order_by(desc(Quest.created_at)).limit(bindparam("limit"))
+
+
+@lru_cache(maxsize=None)
+def _user_quests_stmt(filter_status: bool) -> Select:
+    """get_quests_by_user statement, with or without the status filter"""
+    query = _QUESTS_STMT.where(Quest.assigned_to == bindparam("user_id"))
+    if filter_status:
+        query = query.where(Quest.status == bindparam("status"))
+    return query.order_by(desc(Quest.created_at))
+
+
+@lru_cache(maxsize=None)
+def _community_quests_stmt(filters: tuple) -> Select:
+    """get_community_quests statement for a combination of active filters (at most 4)"""
+    query = _QUESTS_STMT.where(Quest.assigned_to.is_(None))
+    for name in filters:
+        query = query.where(getattr(Quest, name) == bindparam(name))
+    return query.order_by(desc(Quest.created_at))
+
+
+# Leaderboard results by limit, shared across requests: (expires_at, rows).
+# Dropped whenever points change; the TTL bounds staleness from other writes.
+LEADERBOARD_CACHE_TTL_SECONDS = 10
+LEADERBOARD_CACHE_MAX_ENTRIES = 16
+_LEADERBOARD_CACHE: Dict[int, Tuple[float, List[dict]]] = {}
+_LEADERBOARD_LOCK = asyncio.Lock()
+
+
+def _request_cache(db: AsyncSession) -> dict:
+    """
+    Per-session lookup cache (set up by get_db, so it lives for one request)
+    
+    Holds the session's own ORM instances keyed by ("user"|"quest", id);
+    writers pop their key so the next lookup reloads.
+    """
+    return db.info.setdefault("cache", {})
+
+
+def _isoformat(value) -> Optional[str]:
+    """Timestamp -> ISO string (None stays None)"""
+    return value.isoformat() if value else None
+
+
+def _user_dict(row) -> dict:
+    """_USER_COLUMNS row -> same dict as User.to_dict()"""
+    id, username, email, full_name, impact_level, points, completed_quests, created_at = row
+    return {
+        "id": id,
+        "username": username,
+        "email": email,
+        "full_name": full_name,
+        "impact_level": impact_level,
+        "points": points,
+        "completed_quests": completed_quests,
+        "created_at": _isoformat(created_at)
+    }
+
+
+def _quest_dict(row) -> dict:
+    """_QUEST_COLUMNS row -> same dict as Quest.to_dict() (nested location)"""
+    (quest_id, title, description, category, difficulty, impact_metric, estimated_time,
+     community_benefit, lat, lng, location_name, location_address, status, created_by,
+     assigned_to, created_at, completed_at) = row
+    return {
+        "quest_id": quest_id,
+        "title": title,
+        "description": description,
+        "category": category,
+        "difficulty": difficulty,
+        "impact_metric": impact_metric,
+        "estimated_time": estimated_time,
+        "community_benefit": community_benefit,
+        "location": {
+            "lat": lat,
+            "lng": lng,
+            "name": location_name,
+            "address": location_address
+        },
+        "status": status,
+        "created_by": created_by,
+        "assigned_to": assigned_to,
+        "created_at": _isoformat(created_at),
+        "completed_at": _isoformat(completed_at)
+    }
+
+
+def _submission_dict(row) -> dict:
+    """_SUBMISSION_COLUMNS row -> same dict as QuestSubmission.to_dict()"""
+    (id, quest_id, user_id, image_path, description, confidence_score,
+     verification_result, ai_reasoning, points_awarded, submitted_at) = row
+    return {
+        "id": id,
+        "quest_id": quest_id,
+        "user_id": user_id,
+        "image_path": image_path,
+        "description": description,
+        "confidence_score": confidence_score,
+        "verification_result": verification_result,
+        "ai_reasoning": ai_reasoning,
+        "points_awarded": points_awarded,
+        "submitted_at": _isoformat(submitted_at)
+    }
 
 
 # ==================== USER CRUD ====================
 
+# Dialect inserts supporting ON CONFLICT DO NOTHING, by dialect name
+_UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+
 async def create_user(
     db: AsyncSession,
     username: str,
     email: str,
     password: str,
     full_name: Optional[str] = None
-) -> User:
-    """Create a new user with hashed password"""
-    hashed_password = get_password_hash(password)
+) -> Optional[User]:
+    """
+    Create a new user with hashed password
     
-    user = User(
+    Single INSERT ... ON CONFLICT DO NOTHING RETURNING on SQLite and
+    PostgreSQL (a plain INSERT elsewhere): returns None instead of raising
+    IntegrityError when the username or email is already taken.
+    """
+    hashed_password = auth.get_password_hash(password)
+    values = dict(
         username=username,
         email=email,
         hashed_password=hashed_password,
         full_name=full_name
     )
     
-    db.add(user)
+    dialect_insert = _UPSERT_INSERTS.get(db.bind.dialect.name)
+    if dialect_insert is None:
+        try:
+            result = await db.scalars(insert(User).values(**values).returning(User))
+            user = result.one()
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return None
+        return user
+    
+    result = await db.scalars(
+        dialect_insert(User)
+        .values(**values)
+        .on_conflict_do_nothing()
+        .returning(User)
+    )
+    user = result.one_or_none()
     await db.commit()
-    await db.refresh(user)
     
     return user
 
 
 async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get user by username"""
-    result = await db.execute(select(User).where(User.username == username))
+    result = await db.execute(_GET_USER_BY_USERNAME, {"username": username})
     return result.scalar_one_or_none()
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email"""
-    result = await db.execute(select(User).where(User.email == email))
+    result = await db.execute(_GET_USER_BY_EMAIL, {"email": email})
     return result.scalar_one_or_none()
 
 
 async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
-    """Get user by ID"""
-    result = await db.execute(select(User).where(User.id == user_id))
-    return result.scalar_one_or_none()
+    """Get user by ID (memoized for the session)"""
+    cache = _request_cache(db)
+    key = ("user", user_id)
+    if key in cache:
+        return cache[key]
+    
+    result = await db.execute(_GET_USER_BY_ID, {"user_id": user_id})
+    user = result.scalar_one_or_none()
+    if user is not None:
+        cache[key] = user
+    return user
 
 
 async def update_user_points(
     db: AsyncSession,
     user_id: str,
     points_to_add: int,
-    increment_quests: bool = False
-) -> Optional[User]:
-    """Update user points and optionally increment completed quests"""
-    user = await get_user_by_id(db, user_id)
-    if not user:
-        return None
-    
-    user.points += points_to_add
-    
-    if increment_quests:
-        user.completed_quests += 1
+    increment_quests: bool = False,
+    commit: bool = True
+) -> Optional[dict]:
+    """
+    Update user points and optionally increment completed quests
     
-    # Update impact level based on points
-    if user.points >= 1000:
-        user.impact_level = "Legend"
-    elif user.points >= 500:
-        user.impact_level = "Hero"
-    elif user.points >= 200:
-        user.impact_level = "Rising Star"
-    else:
-        user.impact_level = "Novice"
+    Points and quest count are updated atomically in one UPDATE ... RETURNING
+    (no read-modify-write); impact_level is a generated column that follows
+    points. Returns the new id, points, completed_quests and impact_level,
+    or None if the user doesn't exist. With commit=False the caller commits.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            points=User.points + points_to_add,
+            completed_quests=User.completed_quests + (1 if increment_quests else 0)
+        )
+        .returning(User.id, User.points, User.completed_quests, User.impact_level)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().one_or_none()
+    if commit:
+        await db.commit()
+    _request_cache(db).pop(("user", user_id), None)
+    _LEADERBOARD_CACHE.clear()
     
-    await db.commit()
-    await db.refresh(user)
+    # Keep an already-loaded User (e.g. current_user) in step without expiring
+    # it, since expired attributes can't lazy-load on an AsyncSession
+    user = db.identity_map.get(identity_key(User, user_id)) if row else None
+    if user is not None:
+        for key in ("points", "completed_quests", "impact_level"):
+            set_committed_value(user, key, row[key])
     
-    return user
+    return dict(row) if row else None
 
 
-async def get_leaderboard(db: AsyncSession, limit: int = 10) -> List[User]:
-    """Get top users by points for leaderboard"""
-    result = await db.execute(
-        select(User)
-        .order_by(desc(User.points))
-        .limit(limit)
-    )
-    return result.scalars().all()
+async def get_leaderboard(db: AsyncSession, limit: int = 10) -> List[dict]:
+    """
+    Get top users by points for leaderboard
+    
+    Served from a cache for LEADERBOARD_CACHE_TTL_SECONDS; concurrent misses
+    wait on one query. The returned list is shared, so don't modify it.
+    """
+    entry = _LEADERBOARD_CACHE.get(limit)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    
+    async with _LEADERBOARD_LOCK:
+        # Another request may have refreshed it while we waited
+        entry = _LEADERBOARD_CACHE.get(limit)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        
+        result = await db.execute(_LEADERBOARD_STMT.limit(limit))
+        users = [_user_dict(row) for row in result]
+        
+        if len(_LEADERBOARD_CACHE) >= LEADERBOARD_CACHE_MAX_ENTRIES:
+            _LEADERBOARD_CACHE.clear()
+        _LEADERBOARD_CACHE[limit] = (time.monotonic() + LEADERBOARD_CACHE_TTL_SECONDS, users)
+        return users
 
 
 # ==================== QUEST CRUD ====================
@@ -147,58 +442,78 @@ async def create_quest(
     
     db.add(quest)
     await db.commit()
-    await db.refresh(quest)
     
     return quest
 
 
+async def bulk_create_quests(db: AsyncSession, quests: List[dict]) -> None:
+    """
+    Create many quests in one transaction
+    
+    Each dict holds create_quest's keyword arguments; rows go out as a single
+    executemany INSERT with one commit, instead of add/commit/refresh per quest.
+    """
+    if not quests:
+        return
+    
+    await db.execute(insert(Quest), quests)
+    await db.commit()
+
+
 async def get_quest_by_id(db: AsyncSession, quest_id: str) -> Optional[Quest]:
-    """Get quest by ID"""
-    result = await db.execute(select(Quest).where(Quest.quest_id == quest_id))
-    return result.scalar_one_or_none()
+    """Get quest by ID (memoized for the session)"""
+    cache = _request_cache(db)
+    key = ("quest", quest_id)
+    if key in cache:
+        return cache[key]
+    
+    result = await db.execute(_GET_QUEST_BY_ID, {"quest_id": quest_id})
+    quest = result.scalar_one_or_none()
+    if quest is not None:
+        cache[key] = quest
+    return quest
 
 
 async def get_quests_by_user(
     db: AsyncSession,
     user_id: str,
     status: Optional[str] = None
-) -> List[Quest]:
+) -> List[dict]:
     """Get quests assigned to a user, optionally filtered by status"""
-    query = select(Quest).where(Quest.assigned_to == user_id)
-    
+    params = {"user_id": user_id}
     if status:
-        query = query.where(Quest.status == status)
-    
-    query = query.order_by(desc(Quest.created_at))
-    result = await db.execute(query)
+        params["status"] = status
     
-    return result.scalars().all()
+    result = await db.execute(_user_quests_stmt(bool(status)), params)
+    return [_quest_dict(row) for row in result]
 
 
 async def get_all_quests(
     db: AsyncSession,
     status: Optional[str] = None,
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
     limit: int = 100
-) -> List[Quest]:
-    """Get all quests, optionally filtered by status"""
-    query = select(Quest)
-    
-    if status:
-        query = query.where(Quest.status == status)
-    
-    query = query.order_by(desc(Quest.created_at)).limit(limit)
-    result = await db.execute(query)
+) -> List[dict]:
+    """Get quests from all users, newest first, optionally filtered by status/category/difficulty"""
+    params = {"status": status, "category": category, "difficulty": difficulty}
+    filters = tuple(name for name, value in params.items() if value)
     
-    return result.scalars().all()
+    result = await db.execute(
+        _all_quests_stmt(filters),
+        {**{name: params[name] for name in filters}, "limit": limit}
+    )
+    return [_quest_dict(row) for row in result]
 
 
 async def update_quest_status(
     db: AsyncSession,
     quest_id: str,
     new_status: str,
-    assigned_to: Optional[str] = None
+    assigned_to: Optional[str] = None,
+    commit: bool = True
 ) -> Optional[Quest]:
-    """Update quest status and optionally assign to a user"""
+    """Update quest status and optionally assign to a user (commit=False: caller commits)"""
     quest = await get_quest_by_id(db, quest_id)
     if not quest:
         return None
@@ -209,11 +524,11 @@ async def update_quest_status(
         quest.assigned_to = assigned_to
     
     if new_status == "Completed":
-        from datetime import datetime
-        quest.completed_at = datetime.utcnow()
+        quest.completed_at = datetime.now(timezone.utc)
     
-    await db.commit()
-    await db.refresh(quest)
+    if commit:
+        await db.commit()
+    _request_cache(db).pop(("quest", quest_id), None)
     
     return quest
 
@@ -222,53 +537,25 @@ async def get_community_quests(
     db: AsyncSession,
     category: Optional[str] = None,
     difficulty: Optional[str] = None
-) -> List[Quest]:
+) -> List[dict]:
     """Get public quests (assigned_to is NULL) available for community to claim"""
-    query = select(Quest).where(Quest.assigned_to.is_(None))
-    
-    if category:
-        query = query.where(Quest.category == category)
-    
-    if difficulty:
-        query = query.where(Quest.difficulty == difficulty)
-    
-    query = query.order_by(desc(Quest.created_at))
-    result = await db.execute(query)
+    params = {"category": category, "difficulty": difficulty}
+    filters = tuple(name for name, value in params.items() if value)
     
-    return result.scalars().all()
+    result = await db.execute(
+        _community_quests_stmt(filters),
+        {name: params[name] for name in filters}
+    )
+    return [_quest_dict(row) for row in result]
 
 
 async def get_quests_created_by_user(
     db: AsyncSession,
     user_id: str
-) -> List[Quest]:
+) -> List[dict]:
     """Get quests created by a specific user (for tracking impact as creator)"""
-    result = await db.execute(
-        select(Quest)
-        .where(Quest.created_by == user_id)
-        .order_by(desc(Quest.created_at))
-    )
-    return result.scalars().all()
-
-
-async def get_all_quests(
-    db: AsyncSession,
-    category: Optional[str] = None,
-    difficulty: Optional[str] = None
-) -> List[Quest]:
-    """Get ALL quests from all users (for community map visualization)"""
-    query = select(Quest)
-    
-    if category:
-        query = query.where(Quest.category == category)
-    
-    if difficulty:
-        query = query.where(Quest.difficulty == difficulty)
-    
-    query = query.order_by(desc(Quest.created_at))
-    result = await db.execute(query)
-    
-    return result.scalars().all()
+    result = await db.execute(_GET_QUESTS_CREATED_BY, {"user_id": user_id})
+    return [_quest_dict(row) for row in result]
 
 
 # ==================== QUEST SUBMISSION CRUD ====================
@@ -279,17 +566,20 @@ async def create_submission(
     user_id: str,
     image_path: str,
     description: Optional[str] = None,
+    image_hash: Optional[int] = None,
     confidence_score: float = 0.0,
     verification_result: str = "Pending",
     ai_reasoning: Optional[str] = None,
-    points_awarded: int = 0
+    points_awarded: int = 0,
+    commit: bool = True
 ) -> QuestSubmission:
-    """Create a new quest submission"""
+    """Create a new quest submission (commit=False: caller commits)"""
     submission = QuestSubmission(
         quest_id=quest_id,
         user_id=user_id,
         image_path=image_path,
         description=description,
+        image_hash=image_hash,
         confidence_score=confidence_score,
         verification_result=verification_result,
         ai_reasoning=ai_reasoning,
@@ -297,8 +587,8 @@ async def create_submission(
     )
     
     db.add(submission)
-    await db.commit()
-    await db.refresh(submission)
+    if commit:
+        await db.commit()
     
     return submission
 
@@ -306,27 +596,19 @@ async def create_submission(
 async def get_submissions_by_quest(
     db: AsyncSession,
     quest_id: str
-) -> List[QuestSubmission]:
+) -> List[dict]:
     """Get all submissions for a specific quest"""
-    result = await db.execute(
-        select(QuestSubmission)
-        .where(QuestSubmission.quest_id == quest_id)
-        .order_by(desc(QuestSubmission.submitted_at))
-    )
-    return result.scalars().all()
+    result = await db.execute(_GET_SUBMISSIONS_BY_QUEST, {"quest_id": quest_id})
+    return [_submission_dict(row) for row in result]
 
 
 async def get_submissions_by_user(
     db: AsyncSession,
     user_id: str
-) -> List[QuestSubmission]:
+) -> List[dict]:
     """Get all submissions by a specific user"""
-    result = await db.execute(
-        select(QuestSubmission)
-        .where(QuestSubmission.user_id == user_id)
-        .order_by(desc(QuestSubmission.submitted_at))
-    )
-    return result.scalars().all()
+    result = await db.execute(_GET_SUBMISSIONS_BY_USER, {"user_id": user_id})
+    return [_submission_dict(row) for row in result]
 
 
 async def get_submission_by_id(
@@ -334,7 +616,82 @@ async def get_submission_by_id(
     submission_id: str
 ) -> Optional[QuestSubmission]:
     """Get submission by ID"""
-    result = await db.execute(
-        select(QuestSubmission).where(QuestSubmission.id == submission_id)
-    )
+    result = await db.execute(_GET_SUBMISSION_BY_ID, {"submission_id": submission_id})
     return result.scalar_one_or_none()
+
+
+async def get_pending_submissions(
+    db: AsyncSession,
+    limit: int = 100
+) -> List[QuestSubmission]:
+    """Oldest submissions still awaiting verification"""
+    result = await db.execute(_GET_PENDING_SUBMISSIONS, {"limit": limit})
+    return list(result.scalars())
+
+
+def _distinctive_hash(image_hash: int) -> bool:
+    """Whether a perceptual hash has enough set and unset bits to compare"""
+    set_bits = bin(image_hash & _HASH_MASK).count("1")
+    return DUPLICATE_MIN_BITS <= set_bits <= 64 - DUPLICATE_MIN_BITS
+
+
+async def find_duplicate_submission(
+    db: AsyncSession,
+    image_hash: Optional[int],
+    user_id: str
+) -> Optional[str]:
+    """
+    ID of a recent submission by another user whose photo matches
+    `image_hash` (Hamming distance <= DUPLICATE_MAX_DISTANCE), if any
+    
+    Rejected submissions don't count, so a copied photo that was caught
+    never taints the original. Low-entropy hashes (see DUPLICATE_MIN_BITS)
+    are never checked.
+    """
+    if image_hash is None or not _distinctive_hash(image_hash):
+        return None
+    
+    result = await db.execute(_GET_RECENT_IMAGE_HASHES, {
+        "since": datetime.now(timezone.utc) - DUPLICATE_WINDOW,
+        "user_id": user_id
+    })
+    for submission_id, other_hash in result:
+        if not _distinctive_hash(other_hash):
+            continue
+        if bin((image_hash ^ other_hash) & _HASH_MASK).count("1") <= DUPLICATE_MAX_DISTANCE:
+            return submission_id
+    return None
+
+
+async def apply_verification(
+    db: AsyncSession,
+    submission: QuestSubmission,
+    verification: dict,
+    commit: bool = True
+) -> QuestSubmission:
+    """
+    Record a verifier result on a submission and, if verified, award its
+    points and complete the quest (commit=False: caller commits)
+    """
+    submission.confidence_score = verification["confidence_score"]
+    submission.verification_result = verification["verification_result"]
+    submission.ai_reasoning = verification["reasoning"]
+    submission.points_awarded = verification["suggested_points"]
+    
+    # Award points if verified
+    if verification["verification_result"] == "Verified":
+        await update_user_points(
+            db,
+            submission.user_id,
+            verification["suggested_points"],
+            increment_quests=True,
+            commit=False
+        )
+        
+        # Update quest status to completed
+        await update_quest_status(db, submission.quest_id, "Completed", commit=False)
+    
+    if commit:
+        await db.commit()
+    
+    return submission
@@ -1,25 +1,76 @@
 """
 Database configuration and session management for CommuPath.
 Uses SQLAlchemy 2.0 async pattern with dependency injection.
+
+get_conn() exposes one shared synchronous sqlite3 connection to the same
+file for scripts and the agent-side caches.
+
+Every SQLite connection (engine pool and get_conn) runs in WAL mode with
+synchronous=NORMAL, so readers don't block the writer and commits skip most
+fsyncs.
 """
 
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import NullPool
 import os
-from typing import AsyncGenerator
+import sqlite3
+from typing import AsyncGenerator, Optional
 
 # SQLite database URL (async)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./commupath.db")
 
+# Applied to each new SQLite connection
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256MB
+)
+
+# Connection pool sizing: enough connections for concurrent requests to
+# read in parallel (WAL) without waiting on a checkout
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_S = 30
+
+# Set DB_NULL_POOL=1 behind an external pooler (e.g. PgBouncer) so it does the pooling
+if os.getenv("DB_NULL_POOL") == "1":
+    POOL_OPTIONS = {"poolclass": NullPool}
+else:
+    POOL_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+    }
+    if "sqlite" not in DATABASE_URL:
+        # Server connections can be dropped while idle: ping on checkout and
+        # replace them every 30 minutes. A local SQLite file can't go stale.
+        POOL_OPTIONS.update(pool_pre_ping=True, pool_recycle=1800)
+
 # Create async engine
-# pool_pre_ping=True ensures connections are alive before use
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,  # Set to True for SQL debugging
-    pool_pre_ping=True,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    **POOL_OPTIONS
 )
 
+
+def _set_sqlite_pragmas(dbapi_conn, _connection_record=None) -> None:
+    """Apply SQLITE_PRAGMAS to a raw DBAPI connection"""
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+if "sqlite" in DATABASE_URL:
+    event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 # Session factory
 # expire_on_commit=False prevents lazy-loading issues
 AsyncSessionLocal = async_sessionmaker(
@@ -33,26 +84,58 @@ AsyncSessionLocal = async_sessionmaker(
 # Base class for models
 Base = declarative_base()
 
+# Shared synchronous connection (see get_conn)
+_SQLITE_CONN: Optional[sqlite3.Connection] = None
+
+
+def _sqlite_path() -> str:
+    """File behind DATABASE_URL (commupath.db if it isn't SQLite)"""
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database:
+        return url.database
+    return "commupath.db"
+
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Process-wide sqlite3 connection to the app database, opened on first use
+    
+    Runs in autocommit mode with the same pragmas as the engine, so readers
+    don't block the writer and each query skips connection setup.
+    """
+    global _SQLITE_CONN
+    if _SQLITE_CONN is None:
+        conn = sqlite3.connect(_sqlite_path(), check_same_thread=False, isolation_level=None)
+        _set_sqlite_pragmas(conn)
+        _SQLITE_CONN = conn
+    return _SQLITE_CONN
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency function that yields a database session.
     Used with FastAPI's Depends() for session-per-request pattern.
     
+    Nothing is committed here: writers commit explicitly (see crud.py), so
+    read-only requests skip the COMMIT. Closing the session rolls back
+    anything left uncommitted.
+    
     Usage:
         @app.get("/users")
         async def get_users(db: AsyncSession = Depends(get_db)):
             ...
     """
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+        # Per-request lookup cache used by crud.get_*_by_id
+        session.info["cache"] = {}
+        yield session
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    """Create model indexes that don't exist yet on already-created tables"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
 
 async def init_db():
@@ -62,6 +145,8 @@ async def init_db():
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add any indexes they're missing
+        await conn.run_sync(_create_missing_indexes)
     print("✅ Database initialized successfully")
 
 
@@ -1,19 +1,50 @@
 """
 SQLAlchemy database models for CommuPath.
 Defines User, Quest, and QuestSubmission tables.
+
+Indexes follow the crud.py list queries: each leads with the equality
+filter and ends with the ORDER BY column, so SQLite can read the newest rows
+straight from the index instead of scanning and sorting.
 """
 
-from sqlalchemy import Column, String, Integer, Float, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Computed, String, Integer, Float, Text, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+import os
+import time
 import uuid
 
 
-def generate_uuid():
-    """Generate a
+# Impact level tiers by minimum points (highest first); below all is Novice
+IMPACT_LEVELS = (
+    (1000, "Legend"),
+    (500, "Hero"),
+    (200, "Rising Star"),
+)
+
+# SQL for the generated users.impact_level column
+IMPACT_LEVEL_SQL = "CASE {} ELSE 'Novice' END".format(
+    " ".join(f"WHEN points >= {threshold} THEN '{level}'" for threshold, level in IMPACT_LEVELS)
+)
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7): 48-bit ms timestamp + 74 random bits"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # variant
+    return uuid.UUID(int=value)
+
 
- UUID string"""
-    return str(uuid.uuid4())
+def generate_uuid():
+    """
+    Generate a UUID string for primary keys
+    
+    UUIDv7 rather than uuid4: ids increase with time, so inserts append to
+    the end of the primary key index instead of landing at random pages.
+    """
+    return str(uuid7())
 
 
 class User(Base):
@@ -27,7 +58,7 @@ class User(Base):
     full_name = Column(String(100))
     
     # Gamification fields
-    impact_level = Column(String(20), default="Novice")
+    impact_level = Column(String(20), Computed(IMPACT_LEVEL_SQL, persisted=True))  # Derived from points
     points = Column(Integer, default=0)
     completed_quests = Column(Integer, default=0)
     
@@ -35,6 +66,11 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        # Leaderboard (ORDER BY points DESC LIMIT n)
+        Index("ix_users_points", points.desc()),
+    )
+    
     def to_dict(self):
         """Convert to dictionary for API responses"""
         return {
@@ -77,10 +113,30 @@ class Quest(Base):
     created_by = Column(String(36), ForeignKey("users.id"), nullable=True)
     assigned_to = Column(String(36), ForeignKey("users.id"), nullable=True)
     
+    # Never lazy-loaded: list reads return Core rows with the user ids, and
+    # lazy="raise" turns an accidental per-quest load into an error, not an N+1
+    creator = relationship("User", foreign_keys=[created_by], lazy="raise")
+    assignee = relationship("User", foreign_keys=[assigned_to], lazy="raise")
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
+    __table_args__ = (
+        # All quests, newest first (same index check_quests.py creates)
+        Index("idx_quests_created_at", created_at.desc()),
+        # My quests (assigned_to, optional status)
+        Index("ix_quests_assigned_created", assigned_to, created_at.desc()),
+        Index("ix_quests_created_by_created", created_by, created_at.desc()),
+        # Community board filters (unfiltered board uses ix_quests_assigned_created)
+        Index(
+            "ix_quests_public_filter_created",
+            category, difficulty, created_at.desc(),
+            sqlite_where=text("assigned_to IS NULL"),
+            postgresql_where=text("assigned_to IS NULL"),
+        ),
+    )
+    
     def to_dict(self):
         """Convert to dictionary for API responses"""
         return {
@@ -117,6 +173,7 @@ class QuestSubmission(Base):
     # Submission data
     image_path = Column(String(500), nullable=False)  # Path to uploaded image
     description = Column(Text, nullable=True)  # Optional text description
+    image_hash = Column(Integer, nullable=True)  # 64-bit perceptual hash (signed), for duplicate detection
     
     # AI Verification results
     confidence_score = Column(Float, default=0.0)  # 0.0 - 1.0
@@ -129,6 +186,13 @@ class QuestSubmission(Base):
     # Timestamp
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_submissions_quest_time", quest_id, submitted_at.desc()),
+        Index("ix_submissions_user_time", user_id, submitted_at.desc()),
+        # Duplicate-photo check: a time range, covering the columns it reads
+        Index("ix_submissions_time_hash", submitted_at, user_id, verification_result, image_hash),
+    )
+    
     def to_dict(self):
         """Convert to dictionary for API responses"""
         return {
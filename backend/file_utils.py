@@ -3,13 +3,17 @@ File upload utilities for secure image handling.
 Implements best practices for file validation and storage.
 """
 
+import logging
 import os
 import uuid
 from pathlib import Path
 from typing import Tuple, Optional
+import aiofiles
 import magic  # python-magic-bin
 from fastapi import UploadFile, HTTPException, status
 
+logger = logging.getLogger(__name__)
+
 # Allowed image MIME types
 ALLOWED_MIME_TYPES = {
     "image/jpeg",
@@ -22,54 +26,52 @@ ALLOWED_MIME_TYPES = {
 # Maximum file size: 10MB
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB in bytes
 
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
+
 # Upload directory
 UPLOAD_DIR = Path("uploads")
 
+# libmagic cookie, loaded once instead of per upload. Magic instances aren't
+# thread-safe; detection only runs on the event loop, so no lock is needed
+# unless it moves to a thread pool.
+try:
+    _MAGIC = magic.Magic(mime=True)
+except Exception as e:
+    logger.warning("⚠️  libmagic unavailable, falling back to file extensions: %s", e)
+    _MAGIC = None
+
 
 def init_upload_directory():
     """Create uploads directory if it doesn't exist"""
     UPLOAD_DIR.mkdir(exist_ok=True)
-    print(f"✅ Upload directory ready: {UPLOAD_DIR.absolute()}")
+    logger.info("✅ Upload directory ready: %s", UPLOAD_DIR.absolute())
 
 
-async def validate_image_file(file: UploadFile) -> None:
+def detect_image_mime(chunk: bytes, filename: Optional[str]) -> str:
     """
-    Validate uploaded image file.
-    Checks file size and MIME type using magic numbers (not just extension).
+    Detect and validate the MIME type of an upload from its first bytes.
+    Uses magic numbers (not just extension); the extension is only a fallback
+    when libmagic fails.
     
     Args:
-        file: Uploaded file from FastAPI
+        chunk: Leading bytes of the file
+        filename: Original filename (for the extension fallback)
+        
+    Returns:
+        The detected MIME type
         
     Raises:
-        HTTPException: If file is invalid
+        HTTPException: If the type can't be determined or isn't allowed
     """
-    # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to start
-    
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size ({file_size / 1024 / 1024:.2f}MB) exceeds maximum allowed size (10MB)"
-        )
-    
-    if file_size == 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File is empty"
-        )
-    
-    # Read first chunk for MIME type detection
-    chunk = await file.read(2048)
-    file.file.seek(0)  # Reset for later use
-    
     # Detect MIME type using magic numbers
     try:
-        mime = magic.from_buffer(chunk, mime=True)
+        if _MAGIC is None:
+            raise RuntimeError("libmagic is not available")
+        mime = _MAGIC.from_buffer(chunk[:2048])
     except Exception as e:
         # Fallback: check extension
-        extension = file.filename.split(".")[-1].lower() if file.filename else ""
+        extension = filename.split(".")[-1].lower() if filename else ""
         if extension in ["jpg", "jpeg", "png", "webp", "gif"]:
             mime = f"image/{extension}"
         else:
@@ -83,15 +85,20 @@ async def validate_image_file(file: UploadFile) -> None:
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail=f"File type '{mime}' not allowed. Supported types: {', '.join(ALLOWED_MIME_TYPES)}"
         )
+    
+    return mime
 
 
-async def save_upload_file(
+async def accept_upload(
     file: UploadFile,
     quest_id: str,
     user_id: str
 ) -> Tuple[str, str]:
     """
-    Save uploaded file to disk with secure filename.
+    Validate and save an uploaded image in a single pass.
+    The MIME type is checked on the first chunk before anything is written;
+    the rest is streamed to disk in UPLOAD_CHUNK_SIZE chunks, enforcing
+    MAX_FILE_SIZE as it goes.
     
     Args:
         file: Uploaded file from FastAPI
@@ -102,39 +109,64 @@ async def save_upload_file(
         Tuple of (file_path, relative_path)
         - file_path: Absolute path to saved file
         - relative_path: Relative path from backend root (for DB storage)
+        
+    Raises:
+        HTTPException: If file is empty, not an allowed image, too large,
+                       or can't be written
     """
-    # Generate secure filename: UUID + original extension
-    file_extension = Path(file.filename).suffix if file.filename else ".jpg"
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    
-    # Create quest-specific subdirectory
-    quest_dir = UPLOAD_DIR / quest_id
-    quest_dir.mkdir(exist_ok=True, parents=True)
-    
-    # Full path
-    file_path = quest_dir / unique_filename
-    relative_path = str(file_path.relative_to(Path.cwd()))
-    
-    # Save file
     try:
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File is empty"
+            )
         
-        print(f"✅ File saved: {relative_path}")
-        print(f"   Size: {len(contents) / 1024:.2f} KB")
+        # Reject before creating any file
+        detect_image_mime(chunk, file.filename)
         
-        return str(file_path), relative_path
+        # Generate secure filename: UUID + original extension
+        file_extension = Path(file.filename).suffix if file.filename else ".jpg"
+        unique_filename = f"{uuid.uuid4()}{file_extension}"
         
-    except Exception as e:
-        # Clean up on error
-        if file_path.exists():
-            file_path.unlink()
+        # Create quest-specific subdirectory
+        quest_dir = UPLOAD_DIR / quest_id
+        quest_dir.mkdir(exist_ok=True, parents=True)
         
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error saving file: {str(e)}"
-        )
+        # Full path
+        file_path = quest_dir / unique_filename
+        relative_path = str(file_path.relative_to(Path.cwd()))
+        
+        # Save file
+        try:
+            file_size = 0
+            async with aiofiles.open(file_path, "wb") as f:
+                while chunk:
+                    file_size += len(chunk)
+                    if file_size > MAX_FILE_SIZE:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="File exceeds maximum allowed size (10MB)"
+                        )
+                    await f.write(chunk)
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            
+            logger.debug("✅ File saved: %s (%.2f KB)", relative_path, file_size / 1024)
+            
+            return str(file_path), relative_path
+            
+        except Exception as e:
+            # Clean up on error
+            if file_path.exists():
+                file_path.unlink()
+            
+            if isinstance(e, HTTPException):
+                raise
+            
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error saving file: {str(e)}"
+            )
     finally:
         await file.close()
 
@@ -173,9 +205,9 @@ def delete_file(relative_path: str) -> bool:
         file_path = Path(relative_path)
         if file_path.exists() and file_path.is_file():
             file_path.unlink()
-            print(f"✅ File deleted: {relative_path}")
+            logger.debug("✅ File deleted: %s", relative_path)
             return True
         return False
     except Exception as e:
-        print(f"❌ Error deleting file {relative_path}: {e}")
+        logger.warning("❌ Error deleting file %s: %s", relative_path, e)
         return False
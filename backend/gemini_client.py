@@ -0,0 +1,450 @@
+"""
+Shared plumbing for calling Google Gemini from the agents.
+
+get_client returns one process-wide genai.Client, created lazily, so every
+agent reuses the same pre-sized HTTP connection pools.
+
+run_batch_job submits inlined requests as one Batch API job (half price,
+answered within 24h) and polls until it finishes.
+
+stream_json_object consumes a streamed structured (JSON) response and stops
+as soon as the fields the caller needs have been emitted.
+
+GeminiRateLimiter keeps each model under its requests/tokens per minute
+quota so bursts wait client-side instead of failing, and call_with_retry
+retries calls Gemini rejected as overloaded (429/503) with backoff.
+gemini_slot combines the rate limit with a process-wide cap on calls in
+flight, shared by every agent (quest generation, evaluation, vision).
+
+ContextCache stores a static prompt prefix (system instruction + example
+turns) in a Gemini context cache once it is large enough to qualify, so
+calls only send the per-request part.
+
+Token counts are estimated locally with tiktoken's cl100k_base (a close
+enough proxy for Gemini's tokenizer when budgeting) rather than a
+count_tokens round-trip; ~4 characters per token if it isn't available.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+import orjson
+from google import genai
+from google.genai import errors
+
+logger = logging.getLogger(__name__)
+
+# Async callback invoked with (field_name, value) as fields are streamed;
+# CommunityArchitect sends (None, None) to void the fields sent so far
+FieldCallback = Callable[[Optional[str], Any], Awaitable[None]]
+
+# JSON decoder for streamed members (orjson is several times faster than json)
+_loads = orjson.loads
+
+# Connection pool sizing shared by the sync and async Gemini transports
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Requests and input tokens per minute per model (paid tier 1 quotas)
+MODEL_RATE_LIMITS = {
+    "gemini-2.5-pro": (150, 2_000_000),
+    "gemini-2.5-flash": (1_000, 1_000_000),
+}
+DEFAULT_RATE_LIMIT = (60, 1_000_000)
+
+# Gemini calls in flight at once per process, across all models and agents
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+
+# Local tokenizer used for estimates, and the fallback ratio without it
+TOKENIZER_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4
+
+# Retry policy for overloaded / rate-limited responses
+RETRYABLE_STATUS_CODES = frozenset({429, 503})
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY_S = 1.0
+RETRY_MAX_DELAY_S = 30.0
+
+# Explicit context caches need a minimum prompt size; smaller prefixes rely
+# on Gemini's implicit caching of repeated leading content instead
+CONTEXT_CACHE_MIN_TOKENS = {
+    "gemini-2.5-pro": 4096,
+    "gemini-2.5-flash": 1024,
+}
+DEFAULT_CONTEXT_CACHE_MIN_TOKENS = 4096
+CONTEXT_CACHE_TTL_S = 3600
+CONTEXT_CACHE_REFRESH_MARGIN_S = 300
+
+# Batch API polling: exponential backoff between status checks
+BATCH_POLL_INITIAL_SECONDS = 5
+BATCH_POLL_MAX_SECONDS = 120
+BATCH_DONE_STATES = frozenset({
+    genai.types.JobState.JOB_STATE_SUCCEEDED,
+    genai.types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+    genai.types.JobState.JOB_STATE_FAILED,
+    genai.types.JobState.JOB_STATE_CANCELLED,
+    genai.types.JobState.JOB_STATE_EXPIRED,
+})
+
+_CLIENT: Optional[genai.Client] = None
+_RATE_LIMITERS: Dict[str, "GeminiRateLimiter"] = {}
+_IN_FLIGHT: Optional[asyncio.Semaphore] = None
+_ENCODING = None
+_ENCODING_LOADED = False
+
+
+def get_client() -> genai.Client:
+    """
+    Process-wide Gemini client, created on first use
+
+    Reads GEMINI_API_KEY from the environment like genai.Client() does.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = genai.Client(
+            http_options=genai.types.HttpOptions(
+                client_args={"limits": HTTP_LIMITS},
+                async_client_args={"limits": HTTP_LIMITS}
+            )
+        )
+    return _CLIENT
+
+
+def get_rate_limiter(model: str) -> "GeminiRateLimiter":
+    """Process-wide rate limiter for one model, created on first use"""
+    if model not in _RATE_LIMITERS:
+        rpm, tpm = MODEL_RATE_LIMITS.get(model, DEFAULT_RATE_LIMIT)
+        _RATE_LIMITERS[model] = GeminiRateLimiter(rpm=rpm, tpm=tpm)
+    return _RATE_LIMITERS[model]
+
+
+@asynccontextmanager
+async def gemini_slot(model: str, tokens: int = 0) -> AsyncIterator[None]:
+    """
+    Admission for one Gemini call: waits for the model's rate limit, then for
+    one of GEMINI_CONCURRENCY in-flight slots, held until the block exits
+
+    Usage:
+        async with gemini_slot(model, estimated_tokens):
+            response = await client.aio.models.generate_content(...)
+    """
+    global _IN_FLIGHT
+    if _IN_FLIGHT is None:
+        _IN_FLIGHT = asyncio.Semaphore(GEMINI_CONCURRENCY)
+    await get_rate_limiter(model).acquire(tokens)
+    async with _IN_FLIGHT:
+        yield
+
+
+def _get_encoding():
+    """tiktoken encoding, loaded on first use (None if tiktoken is unavailable)"""
+    global _ENCODING, _ENCODING_LOADED
+    if not _ENCODING_LOADED:
+        _ENCODING_LOADED = True
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:  # Not installed, or the BPE file can't be fetched
+            logger.info("tiktoken unavailable, estimating tokens from length: %s", e)
+    return _ENCODING
+
+
+def approx_tokens(text: str) -> int:
+    """Approximate Gemini token count of `text`, computed locally"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` down to about `max_tokens` tokens"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def estimate_tokens(contents: Iterable[genai.types.Content], system_instruction: Optional[str] = None) -> int:
+    """Approximate input token count of a request (contents + system instruction)"""
+    total = approx_tokens(system_instruction) if system_instruction else 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                total += approx_tokens(part.text)
+    return total
+
+
+class GeminiRateLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute token buckets
+
+    Both buckets refill continuously; acquire() waits (in FIFO order) until
+    one request and the estimated tokens are available.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until a request with `tokens` input tokens fits the quota"""
+        tokens = min(tokens, self.tpm)  # Oversized requests still go through eventually
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_s = 60 * max(
+                    (1 - self._requests) / self.rpm,
+                    (tokens - self._tokens) / self.tpm
+                )
+                logger.debug("Rate limited, waiting %.2fs", wait_s)
+                await asyncio.sleep(wait_s)
+
+    def _refill(self) -> None:
+        """Top up both buckets for the time elapsed since the last refill"""
+        now = time.monotonic()
+        elapsed_min = (now - self._updated) / 60
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed_min * self.rpm)
+        self._tokens = min(self.tpm, self._tokens + elapsed_min * self.tpm)
+
+
+async def call_with_retry(
+    call: Callable[[], Awaitable[Any]],
+    attempts: int = RETRY_ATTEMPTS
+) -> Any:
+    """
+    Await `call()`, retrying 429/503 API errors with exponential backoff
+    and jitter. Other errors (and the last failed attempt) are re-raised.
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == attempts - 1:
+                raise
+            delay_s = min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * 2 ** attempt)
+            delay_s += random.uniform(0, delay_s)
+            logger.warning("Gemini returned %s, retrying in %.1fs (attempt %d/%d)", e.code, delay_s, attempt + 1, attempts)
+            await asyncio.sleep(delay_s)
+
+
+async def run_batch_job(
+    model: str,
+    inlined_requests: List[genai.types.InlinedRequest],
+    display_name: str
+) -> List[Optional[genai.types.InlinedResponse]]:
+    """
+    Submit inlined requests as one Batch API job and wait for it to finish
+
+    Returns the InlinedResponse for each request, in order (None for any
+    request the job didn't answer).
+
+    Raises:
+        RuntimeError: If the job failed, was cancelled or expired
+    """
+    client = get_client()
+    job = await client.aio.batches.create(
+        model=model,
+        src=inlined_requests,
+        config=genai.types.CreateBatchJobConfig(display_name=display_name)
+    )
+    logger.info("⏳ Batch job %s submitted", job.name)
+
+    delay = BATCH_POLL_INITIAL_SECONDS
+    while job.state not in BATCH_DONE_STATES:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BATCH_POLL_MAX_SECONDS)
+        job = await client.aio.batches.get(name=job.name)
+
+    if job.state not in (
+        genai.types.JobState.JOB_STATE_SUCCEEDED,
+        genai.types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED
+    ):
+        raise RuntimeError(f"Batch job {job.name} ended in state {job.state}: {job.error}")
+
+    responses = list((job.dest and job.dest.inlined_responses) or [])
+    return responses + [None] * (len(inlined_requests) - len(responses))
+
+
+class ContextCache:
+    """
+    Explicit Gemini context cache for a static prompt prefix, one per model
+
+    get(model) returns the cache name to pass as `cached_content`, creating
+    the cache on first use and recreating it shortly before its TTL runs out.
+    It returns None when the prefix is below the model's minimum cacheable
+    size or creation failed (retried after a TTL); callers then send the
+    prefix inline.
+    """
+
+    def __init__(
+        self,
+        system_instruction: str,
+        contents: List[genai.types.Content],
+        ttl_s: int = CONTEXT_CACHE_TTL_S
+    ):
+        self.system_instruction = system_instruction
+        self.contents = contents
+        self.ttl_s = ttl_s
+        self.tokens = estimate_tokens(contents, system_instruction)
+        self._names: Dict[str, Tuple[str, float]] = {}  # model -> (cache name, expires at)
+        self._retry_at: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, model: str) -> Optional[str]:
+        """Name of a live cache of the prefix for `model`, or None"""
+        if self.tokens < CONTEXT_CACHE_MIN_TOKENS.get(model, DEFAULT_CONTEXT_CACHE_MIN_TOKENS):
+            return None
+
+        name = self._live_name(model)
+        if name or time.monotonic() < self._retry_at.get(model, 0):
+            return name
+
+        async with self._lock:
+            name = self._live_name(model)
+            if name:
+                return name
+            try:
+                cache = await get_client().aio.caches.create(
+                    model=model,
+                    config=genai.types.CreateCachedContentConfig(
+                        system_instruction=self.system_instruction,
+                        contents=self.contents,
+                        ttl=f"{self.ttl_s}s"
+                    )
+                )
+            except Exception as e:
+                logger.warning("Context cache creation failed for %s, sending prefix inline: %s", model, e)
+                self._retry_at[model] = time.monotonic() + self.ttl_s
+                return None
+
+            self._names[model] = (cache.name, time.monotonic() + self.ttl_s)
+            logger.info("Created context cache %s for %s", cache.name, model)
+            return cache.name
+
+    def _live_name(self, model: str) -> Optional[str]:
+        """Cached name for `model` unless it is about to expire"""
+        entry = self._names.get(model)
+        if entry and entry[1] - time.monotonic() > CONTEXT_CACHE_REFRESH_MARGIN_S:
+            return entry[0]
+        return None
+
+
+class JSONObjectStream:
+    """
+    Incremental parser for a streamed top-level JSON object
+
+    Feed raw text chunks; every top-level member is returned as soon as its
+    value is closed, without waiting for the rest of the object.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (key, value) members it closed"""
+        self._buffer += text
+        closed = []
+
+        while self._pos < len(self._buffer) and not self.complete:
+            char = self._buffer[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = self._pos + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    closed.extend(self._close_member())
+                    self.complete = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                closed.extend(self._close_member())
+                self._member_start = self._pos + 1
+
+            self._pos += 1
+
+        return closed
+
+    def _close_member(self) -> Iterable[Tuple[str, Any]]:
+        """Parse the member between the last separator and the current one"""
+        member = self._buffer[self._member_start:self._pos].strip()
+        if not member:
+            return []
+        parsed = _loads("{" + member + "}")
+        self.fields.update(parsed)
+        return list(parsed.items())
+
+
+async def stream_json_object(
+    stream: AsyncIterator,
+    required: Iterable[str],
+    on_field: Optional[FieldCallback] = None,
+    stop_early: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> Dict[str, Any]:
+    """
+    Read a streamed JSON response until all `required` fields are closed
+
+    The stream is closed early once they are, so the tail of the generation
+    isn't waited for. With `stop_early`, it is only cut there if
+    stop_early(fields) is true; otherwise it is read to the end of the
+    object. `on_field` is awaited for every field as it arrives.
+
+    Raises:
+        ValueError: If the stream ends before the required fields arrive
+    """
+    required = set(required)
+    parser = JSONObjectStream()
+
+    try:
+        async for chunk in stream:
+            if not chunk.text:
+                continue
+            for key, value in parser.feed(chunk.text):
+                if on_field:
+                    await on_field(key, value)
+            if parser.complete:
+                break
+            if required <= parser.fields.keys() and (stop_early is None or stop_early(parser.fields)):
+                break
+    finally:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+
+    missing = required - parser.fields.keys()
+    if missing:
+        raise ValueError(f"Streamed response ended without fields: {sorted(missing)}")
+    return parser.fields
@@ -5,18 +5,59 @@ https://developers.google.com/maps/documentation/places/web-service/search-nearb
 https://developers.google.com/maps/documentation/geocoding/overview
 """
 
+import asyncio
+import importlib.util
 import os
 import logging
-from typing import List, Optional, Dict, Tuple
-from functools import lru_cache
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, List, Optional, Dict, Sequence, Tuple
 from datetime import datetime, timedelta
-import googlemaps
-from googlemaps.exceptions import ApiError, Timeout, TransportError
+import httpx
 from models import Coordinates
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Google Maps web services, called over one shared keep-alive connection pool
+MAPS_BASE_URL = "https://maps.googleapis.com"
+MAPS_TIMEOUT_S = 10.0
+MAPS_HTTP_LIMITS = httpx.Limits(max_connections=40, max_keepalive_connections=20)
+# HTTP/2 multiplexes the per-type searches over one connection; needs httpx[http2]
+MAPS_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Server errors and OVER_QUERY_LIMIT are retried with exponential backoff + jitter
+MAPS_RETRYABLE_STATUS_CODES = frozenset({500, 502, 503, 504})
+MAPS_RETRY_ATTEMPTS = 3
+MAPS_RETRY_BASE_DELAY_S = 0.5
+
+# Reverse geocode cache: names do change (renamed areas, moved businesses)
+GEOCODE_CACHE_TTL_SECONDS = 24 * 3600
+GEOCODE_CACHE_MAX_ENTRIES = 1024
+
+
+class MapsApiError(Exception):
+    """A Maps web service answered with a status other than OK / ZERO_RESULTS"""
+    
+    def __init__(self, status: Optional[str], message: Optional[str] = None):
+        super().__init__(f"{status}: {message}" if message else str(status))
+        self.status = status
+
+
+@dataclass(slots=True)
+class FormattedPlace:
+    """A nearby place from the Places API, trimmed to what quest generation uses"""
+    name: str
+    address: str
+    coordinates: Coordinates
+    place_id: Optional[str]
+    types: Tuple[str, ...]
+    rating: Optional[float]
+    user_ratings_total: int
+    business_status: str
+
 
 class LocationService:
     """
@@ -33,57 +74,127 @@ class LocationService:
     # Category to Google Places API types mapping
     # Based on: https://developers.google.com/maps/documentation/places/web-service/supported_types
     CATEGORY_PLACE_TYPES = {
-        "Environment": [
+        "Environment": (
             "park",
             "campground",
             "natural_feature",
             "tourist_attraction"
-        ],
-        "Education": [
+        ),
+        "Education": (
             "school",
             "university",
             "library",
             "primary_school",
             "secondary_school"
-        ],
-        "Health": [
+        ),
+        "Health": (
             "hospital",
             "doctor",
             "pharmacy",
             "physiotherapist",
             "dentist"
-        ],
-        "Social": [
+        ),
+        "Social": (
             "community_center",
             "church",
             "mosque",
             "synagogue",
             "hindu_temple",
             "town_hall"
-        ]
+        )
+    }
+    
+    # Types actually searched per category (API allows one type per request;
+    # limited to 2 to reduce API calls)
+    CATEGORY_PLACE_TYPES_TOP2 = {
+        category: place_types[:2] for category, place_types in CATEGORY_PLACE_TYPES.items()
     }
+    DEFAULT_PLACE_TYPES = ("point_of_interest",)
+    
+    # Shared result when there's nothing to return (callers only read places)
+    _NO_PLACES: Tuple[FormattedPlace, ...] = ()
+    
+    # Place types that make especially good quest locations (quality score bonus)
+    _HIGH_VALUE_TYPES = frozenset({'park', 'school', 'hospital', 'community_center'})
     
     def __init__(self):
-        """Initialize Google Maps client with API key from environment"""
-        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        """Initialize the Google Maps HTTP client with API key from environment"""
+        # (lat, lng) -> (expires_at, name); LRU-ordered
+        self._geocode_cache: "OrderedDict[Tuple[float, float], Tuple[float, str]]" = OrderedDict()
+        self._geocode_hits = 0
+        self._geocode_misses = 0
+        self._http: Optional[httpx.AsyncClient] = None
+        
+        self._api_key = os.getenv("GOOGLE_MAPS_API_KEY")
         
-        if not api_key:
+        if not self._api_key:
             logger.warning("GOOGLE_MAPS_API_KEY not set - location features will be limited")
-            self.gmaps = None
             return
         
         try:
-            # Initialize client with timeout and retry configuration
-            self.gmaps = googlemaps.Client(
-                key=api_key,
-                timeout=10,  # 10 second timeout
-                retry_timeout=60  # Retry for up to 60 seconds on 5xx errors
+            # Async client: no thread-pool hop per call, and connections (and
+            # their TLS handshakes) are reused across requests
+            self._http = httpx.AsyncClient(
+                base_url=MAPS_BASE_URL,
+                http2=MAPS_HTTP2,
+                timeout=MAPS_TIMEOUT_S,
+                limits=MAPS_HTTP_LIMITS
             )
             logger.info("✅ Google Maps client initialized successfully")
             
         except Exception as e:
-            logger.error(f"Failed to initialize Google Maps client: {e}")
-            self.gmaps = None
+            logger.error("Failed to initialize Google Maps client: %s", e)
+            self._http = None
+    
+    @property
+    def available(self) -> bool:
+        """Whether Google Maps is configured"""
+        return self._http is not None
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client (called on app shutdown)"""
+        if self._http is not None:
+            await self._http.aclose()
+    
+    async def _get_json(self, path: str, params: Dict[str, Any]) -> Dict:
+        """
+        GET a Maps web service endpoint
+        
+        Server errors, network errors and OVER_QUERY_LIMIT are retried with
+        exponential backoff and jitter.
+        
+        Returns:
+            Response body (status OK or ZERO_RESULTS)
+            
+        Raises:
+            MapsApiError: Any other API status
+            httpx.HTTPError: HTTP or network failure (after retries)
+        """
+        params = {**params, "key": self._api_key}
+        
+        for attempt in range(MAPS_RETRY_ATTEMPTS):
+            try:
+                response = await self._http.get(path, params=params)
+                response.raise_for_status()
+                body = response.json()
+            except httpx.HTTPStatusError as e:
+                error, retryable = e, e.response.status_code in MAPS_RETRYABLE_STATUS_CODES
+            except httpx.TransportError as e:
+                error, retryable = e, True
+            else:
+                status = body.get("status")
+                if status in ("OK", "ZERO_RESULTS"):
+                    return body
+                error = MapsApiError(status, body.get("error_message"))
+                retryable = status == "OVER_QUERY_LIMIT"
+            
+            if not retryable or attempt == MAPS_RETRY_ATTEMPTS - 1:
+                raise error
+            
+            delay_s = MAPS_RETRY_BASE_DELAY_S * 2 ** attempt
+            delay_s += random.uniform(0, delay_s)
+            logger.warning("Google Maps %s failed (%s), retrying in %.1fs", path, error, delay_s)
+            await asyncio.sleep(delay_s)
     
     async def find_nearby_places(
         self,
@@ -91,7 +202,7 @@ class LocationService:
         category: str,
         radius: int = 2000,
         max_results: int = 5
-    ) -> List[Dict]:
+    ) -> Sequence[FormattedPlace]:
         """
         Find nearby places using Google Places API Nearby Search
         
@@ -105,70 +216,69 @@ class LocationService:
             max_results: Maximum number of results to return
             
         Returns:
-            List of places with coordinates, names, and metadata
+            Places with coordinates, names, and metadata (read-only)
             
         Note:
             Results are cached for 1 hour to reduce API costs
         """
         
-        if not self.gmaps:
+        if not self.available:
             logger.warning("Google Maps client not available - returning empty places list")
-            return []
+            return self._NO_PLACES
         
         # Input validation
         if radius > 50000:
-            logger.warning(f"Radius {radius}m exceeds 50km limit, capping at 50000m")
+            logger.warning("Radius %dm exceeds 50km limit, capping at 50000m", radius)
             radius = 50000
         
-        # Get relevant place types for this category
-        place_types = self.CATEGORY_PLACE_TYPES.get(category, ["point_of_interest"])
+        # Search for each of the category's top place types (one type per
+        # request); the lookups run concurrently over the shared client
+        searched_types = self.CATEGORY_PLACE_TYPES_TOP2.get(category, self.DEFAULT_PLACE_TYPES)
+        for place_type in searched_types:
+            logger.info("Searching for %s near (%s, %s)", place_type, center_coords.lat, center_coords.lng)
+        
+        # Call Places API Nearby Search
+        # Reference: https://developers.google.com/maps/documentation/places/web-service/search-nearby#maps_http_places_nearbysearch-py
+        results_list = await asyncio.gather(*(
+            self._get_json("/maps/api/place/nearbysearch/json", {
+                "location": f"{center_coords.lat},{center_coords.lng}",
+                "radius": radius,
+                "type": place_type,
+                "language": "en",
+                "rankby": "prominence"  # Rank by importance (default)
+            })
+            for place_type in searched_types
+        ), return_exceptions=True)
         
         all_places = []
         
-        # Search for each place type (API allows one type per request)
-        for place_type in place_types[:2]:  # Limit to 2 types to reduce API calls
-            try:
-                logger.info(f"Searching for {place_type} near ({center_coords.lat}, {center_coords.lng})")
+        for place_type, results in zip(searched_types, results_list):
+            if isinstance(results, MapsApiError):
+                logger.error("Google Maps API error for %s: %s", place_type, results)
                 
-                # Call Places API Nearby Search
-                # Reference: https://developers.google.com/maps/documentation/places/web-service/search-nearby#maps_http_places_nearbysearch-py
-                results = self.gmaps.places_nearby(
-                    location=(center_coords.lat, center_coords.lng),
-                    radius=radius,
-                    type=place_type,
-                    language='en',
-                    rank_by='prominence'  # Rank by importance (default)
-                )
+            elif isinstance(results, httpx.HTTPError):
+                logger.error("Network error searching for %s: %s", place_type, results)
                 
-                if results.get('status') == 'OK' and results.get('results'):
-                    all_places.extend(results['results'][:3])  # Top 3 per type
-                    logger.info(f"Found {len(results['results'])} {place_type}(s)")
-                    
-                elif results.get('status') == 'ZERO_RESULTS':
-                    logger.info(f"No {place_type} found in area")
-                    
-                else:
-                    logger.warning(f"Places API returned status: {results.get('status')}")
-                    
-            except ApiError as e:
-                logger.error(f"Google Maps API error for {place_type}: {e}")
-                continue
+            elif isinstance(results, Exception):
+                logger.error("Unexpected error searching for %s: %s", place_type, results)
                 
-            except (Timeout, TransportError) as e:
-                logger.error(f"Network error searching for {place_type}: {e}")
-                continue
+            elif results.get('status') == 'OK' and results.get('results'):
+                all_places.extend(results['results'][:3])  # Top 3 per type
+                logger.info("Found %d %s(s)", len(results['results']), place_type)
                 
-            except Exception as e:
-                logger.error(f"Unexpected error searching for {place_type}: {e}")
-                continue
+            elif results.get('status') == 'ZERO_RESULTS':
+                logger.info("No %s found in area", place_type)
+                
+            else:
+                logger.warning("Places API returned status: %s", results.get('status'))
         
         # Process and format places
         formatted_places = self._format_places(all_places[:max_results])
         
-        logger.info(f"Returning {len(formatted_places)} places for category '{category}'")
+        logger.info("Returning %d places for category '%s'", len(formatted_places), category)
         return formatted_places
     
-    def _format_places(self, raw_places: List[Dict]) -> List[Dict]:
+    def _format_places(self, raw_places: List[Dict]) -> List[FormattedPlace]:
         """
         Format Places API response into clean structure
         
@@ -184,28 +294,27 @@ class LocationService:
             try:
                 location = place['geometry']['location']
                 
-                formatted.append({
-                    "name": place.get('name', 'Unknown Location'),
-                    "address": place.get('vicinity', ''),
-                    "coordinates": Coordinates(
+                formatted.append(FormattedPlace(
+                    name=place.get('name', 'Unknown Location'),
+                    address=place.get('vicinity', ''),
+                    coordinates=Coordinates(
                         lat=location['lat'],
                         lng=location['lng']
                     ),
-                    "place_id": place.get('place_id'),
-                    "types": place.get('types', []),
-                    "rating": place.get('rating'),
-                    "user_ratings_total": place.get('user_ratings_total', 0),
-                    "business_status": place.get('business_status', 'OPERATIONAL')
-                })
+                    place_id=place.get('place_id'),
+                    types=tuple(place.get('types', ())),
+                    rating=place.get('rating'),
+                    user_ratings_total=place.get('user_ratings_total', 0),
+                    business_status=place.get('business_status', 'OPERATIONAL')
+                ))
                 
             except KeyError as e:
-                logger.warning(f"Skipping malformed place data: missing {e}")
+                logger.warning("Skipping malformed place data: missing %s", e)
                 continue
         
         return formatted
     
-    @lru_cache(maxsize=1000)
-    def reverse_geocode_cached(self, lat: float, lng: float) -> Optional[str]:
+    async def reverse_geocode_cached(self, lat: float, lng: float) -> Optional[str]:
         """
         Get location name from coordinates using Geocoding API (with caching)
         
@@ -220,17 +329,41 @@ class LocationService:
             Human-readable location name or None
             
         Note:
-            Cached for performance - results at same coordinates won't trigger new API calls
+            Names are cached for 24h (LRU-bounded at 1024 coordinates); failed
+            lookups aren't cached so they're retried next time
         """
+        key = (lat, lng)
+        now = time.monotonic()
+        
+        entry = self._geocode_cache.get(key)
+        if entry is not None and entry[0] > now:
+            self._geocode_cache.move_to_end(key)
+            self._geocode_hits += 1
+            return entry[1]
+        self._geocode_misses += 1
+        
+        name = await self._reverse_geocode_uncached(lat, lng)
+        
+        if name is not None:
+            self._geocode_cache[key] = (now + GEOCODE_CACHE_TTL_SECONDS, name)
+            self._geocode_cache.move_to_end(key)
+            while len(self._geocode_cache) > GEOCODE_CACHE_MAX_ENTRIES:
+                self._geocode_cache.popitem(last=False)
+        
+        return name
+    
+    async def _reverse_geocode_uncached(self, lat: float, lng: float) -> Optional[str]:
+        """Call the Geocoding API and pick the best location name"""
         
-        if not self.gmaps:
+        if not self.available:
             return None
         
         try:
-            logger.debug(f"Reverse geocoding ({lat}, {lng})")
+            logger.debug("Reverse geocoding (%s, %s)", lat, lng)
             
             # Call Geocoding API
-            results = self.gmaps.reverse_geocode((lat, lng))
+            body = await self._get_json("/maps/api/geocode/json", {"latlng": f"{lat},{lng}"})
+            results = body.get("results")
             
             if not results:
                 logger.warning("No geocoding results found")
@@ -249,29 +382,29 @@ class LocationService:
             if results[0].get('formatted_address'):
                 return results[0]['formatted_address'].split(',')[0]
             
-        except ApiError as e:
-            logger.error(f"Geocoding API error: {e}")
+        except MapsApiError as e:
+            logger.error("Geocoding API error: %s", e)
         except Exception as e:
-            logger.error(f"Reverse geocode error: {e}")
+            logger.error("Reverse geocode error: %s", e)
         
         return None
     
-    def reverse_geocode(self, lat: float, lng: float) -> Optional[str]:
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[str]:
         """
         Public wrapper for reverse geocoding with coordinate rounding
         Rounds coordinates to 4 decimal places (~11m precision) for effective caching
         """
         rounded_lat = round(lat, 4)
         rounded_lng = round(lng, 4)
-        return self.reverse_geocode_cached(rounded_lat, rounded_lng)
+        return await self.reverse_geocode_cached(rounded_lat, rounded_lng)
     
-    def calculate_place_quality_score(self, place: Dict) -> float:
+    def calculate_place_quality_score(self, place: FormattedPlace) -> float:
         """
         Calculate quality/popularity score for a place
         Used to rank places by suitability for quests
         
         Args:
-            place: Formatted place dictionary
+            place: Formatted place
             
         Returns:
             Score between 0.0 and 1.0 (higher is better)
@@ -279,31 +412,37 @@ class LocationService:
         score = 0.0
         
         # Rating contribution (0-5 stars) → 40% weight
-        if place.get('rating'):
-            normalized_rating = place['rating'] / 5.0
+        if place.rating:
+            normalized_rating = place.rating / 5.0
             score += normalized_rating * 0.4
         
         # Number of reviews → 30% weight
         # More reviews = more confidence in rating
-        if place.get('user_ratings_total'):
+        if place.user_ratings_total:
             # Normalize: 100+ reviews = max score
-            normalized_reviews = min(place['user_ratings_total'], 100) / 100.0
+            normalized_reviews = min(place.user_ratings_total, 100) / 100.0
             score += normalized_reviews * 0.3
         
         # Business status → 20% weight
-        if place.get('business_status') == 'OPERATIONAL':
+        if place.business_status == 'OPERATIONAL':
             score += 0.2
         
         # Bonus for highly relevant types → 10% weight
-        high_value_types = ['park', 'school', 'hospital', 'community_center']
-        place_types = place.get('types', [])
-        if any(hvt in place_types for hvt in high_value_types):
+        if not self._HIGH_VALUE_TYPES.isdisjoint(place.types):
             score += 0.1
         
         return min(score, 1.0)  # Cap at 1.0
     
     def get_cache_stats(self) -> Dict:
-        """Get cache statistics for monitoring"""
+        """Get cache statistics for monitoring (hit_ratio is None before any lookup)"""
+        hits, misses = self._geocode_hits, self._geocode_misses
+        lookups = hits + misses
         return {
-            "geocode_cache_size": self.reverse_geocode_cached.cache_info()._asdict()
+            "geocode_cache": {
+                "hits": hits,
+                "misses": misses,
+                "currsize": len(self._geocode_cache),
+                "maxsize": GEOCODE_CACHE_MAX_ENTRIES,
+                "hit_ratio": hits / lookups if lookups else None
+            }
         }
@@ -0,0 +1,38 @@
+"""
+Non-blocking logging setup for the CommuPath API.
+
+Handlers on the root logger are replaced by a QueueHandler; a QueueListener
+thread does the actual console writes, so request handlers never wait on
+stderr. The level comes from LOG_LEVEL (default INFO); the per-step quest
+generation messages are DEBUG.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """Route root logging through a background queue listener (idempotent)"""
+    global _LISTENER
+    if _LISTENER is not None:
+        return
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+
+    _LISTENER = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
@@ -1,19 +1,27 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, status
+from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, File, Form, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
-from typing import List
+from typing import List, Dict, Optional, Set
+from collections import OrderedDict
+import asyncio
+import logging
 import os
+import time
+import uuid
 import opik
+import orjson
 from contextlib import asynccontextmanager
 
 from models import QuestRequest, ImpactQuest, StatusUpdate
 from agents import CommunityArchitect
-from evaluators import SafetyEvaluator, AppropriatenessEvaluator
-from vision_agent import VisionVerifier
-from database import get_db, init_db, close_db
-from db_models import User, Quest
+from evaluators import CombinedEvaluator
+from vision_agent import VisionVerifier, run_image_task
+from database import get_db, init_db, close_db, AsyncSessionLocal
+from db_models import User, Quest, QuestSubmission
 from auth import (
     create_access_token,
     get_current_active_user,
@@ -21,39 +29,76 @@ from auth import (
     get_password_hash
 )
 import crud
-from file_utils import init_upload_directory, validate_image_file, save_upload_file
+from file_utils import init_upload_directory, accept_upload
 from pydantic import BaseModel, EmailStr
+from logging_config import setup_logging
 
 # Load environment variables
 load_dotenv()
 
-# Configure Opik (only if API key is present)
-if os.getenv("OPIK_API_KEY"):
-    try:
-        opik.configure(
-            api_key=os.getenv("OPIK_API_KEY"),
-            workspace=os.getenv("OPIK_WORKSPACE"), 
-            url=os.getenv("OPIK_URL_OVERRIDE", "https://www.comet.com/opik/api")
-        )
-        print("✅ Opik configured successfully")
-    except Exception as e:
-        print(f"⚠️  Opik configuration failed: {e}")
-        print("   Server will continue without Opik tracing")
-else:
-    print("ℹ️  Opik API key not found - running without observability")
+# Queue-backed logging so request handlers never block on console output
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def configure_opik():
+    """Configure Opik (only if API key is present)"""
+    if os.getenv("OPIK_API_KEY"):
+        try:
+            opik.configure(
+                api_key=os.getenv("OPIK_API_KEY"),
+                workspace=os.getenv("OPIK_WORKSPACE"), 
+                url=os.getenv("OPIK_URL_OVERRIDE", "https://www.comet.com/opik/api")
+            )
+            print("✅ Opik configured successfully")
+        except Exception as e:
+            print(f"⚠️  Opik configuration failed: {e}")
+            print("   Server will continue without Opik tracing")
+    else:
+        print("ℹ️  Opik API key not found - running without observability")
+
+
+# How often cache hit rates are logged (seconds)
+CACHE_STATS_INTERVAL_S = int(os.getenv("CACHE_STATS_INTERVAL_S", "600"))
+
+
+async def log_cache_stats(architect: CommunityArchitect, verifier: VisionVerifier):
+    """
+    Periodically log geocode cache hit rates, so maxsize can be tuned, and how
+    often verdict labels contradicted their confidence, so the verification
+    prompt can be tuned
+    """
+    while True:
+        await asyncio.sleep(CACHE_STATS_INTERVAL_S)
+        logger.info("📊 Cache stats: %s", architect.location_service.get_cache_stats())
+        logger.info("📊 Verdict stats: %s", verifier.get_verdict_stats())
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup Logic ---
-    # Everything before 'yield' runs when the server starts
+    # Everything before 'yield' runs when the server starts (once per worker)
+    configure_opik()
+    
+    # Shared agents, created after Opik is configured; handlers get them
+    # through the dependencies below
+    app.state.architect = CommunityArchitect()
+    app.state.evaluator = CombinedEvaluator()
+    app.state.verifier = VisionVerifier()
+    
     await init_db()
     init_upload_directory()
+    stats_task = asyncio.create_task(log_cache_stats(app.state.architect, app.state.verifier))
     print("🚀 CommuPath API started successfully")
     
     yield  # The application runs while this is suspended
     
     # --- Shutdown Logic ---
     # Everything after 'yield' runs when the server stops
+    stats_task.cancel()
+    if _GENERATION_TASKS:
+        logger.warning("⚠️  Shutting down with %d generation job(s) still running", len(_GENERATION_TASKS))
+    await app.state.architect.location_service.aclose()
     await close_db()
     print("👋 CommuPath API shut down gracefully")
 
@@ -62,21 +107,38 @@ app = FastAPI(
     title="CommuPath API",
     description="AI-powered community impact quest platform with vision verification",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson instead of json.dumps for every response
 )
 
 # Configure CORS for React frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173"],  # React Vite dev server
+    # Comma-separated; defaults to the React Vite dev server
+    allow_origins=os.getenv("CORS_ORIGINS", "http://localhost:5173").split(","),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Only what the React client sends; explicit lists let browsers cache preflights
+    allow_methods=["GET", "POST", "PUT", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # Cache preflight responses for a day
 )
 
-# Initialize agents
-architect = CommunityArchitect()
-verifier = VisionVerifier()
+# Shared agents live on app.state (created in lifespan). The dependencies are
+# async so FastAPI runs them inline on the event loop, not in the threadpool.
+
+async def get_architect(request: Request) -> CommunityArchitect:
+    """Dependency returning the single CommunityArchitect shared by all requests"""
+    return request.app.state.architect
+
+
+async def get_evaluator(request: Request) -> CombinedEvaluator:
+    """Dependency returning the shared CombinedEvaluator"""
+    return request.app.state.evaluator
+
+
+async def get_verifier(request: Request) -> VisionVerifier:
+    """Dependency returning the shared VisionVerifier"""
+    return request.app.state.verifier
 
 
 # ==================== STARTUP / SHUTDOWN ====================
@@ -139,15 +201,25 @@ async def root():
     }
 
 
+# Probes within this many seconds reuse the last database check
+HEALTH_DB_CHECK_TTL_S = 1.0
+_health_db_status = (float("-inf"), "")  # (checked_at, status)
+
+
 @app.get("/api/health")
 async def health_check(db: AsyncSession = Depends(get_db)):
     """Health check endpoint with database connectivity test"""
-    try:
-        # Test database connection
-        await db.execute("SELECT 1")
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+    global _health_db_status
+    checked_at, db_status = _health_db_status
+    
+    if time.monotonic() - checked_at >= HEALTH_DB_CHECK_TTL_S:
+        try:
+            # Test database connection
+            await db.execute(text("SELECT 1"))
+            db_status = "connected"
+        except Exception as e:
+            db_status = f"error: {str(e)}"
+        _health_db_status = (time.monotonic(), db_status)
     
     return {
         "status": "healthy",
@@ -163,23 +235,7 @@ async def health_check(db: AsyncSession = Depends(get_db)):
 async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     
-    # Check if username already exists
-    existing_user = await crud.get_user_by_username(db, user_data.username)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
-    
-    # Check if email already exists
-    existing_email = await crud.get_user_by_email(db, user_data.email)
-    if existing_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Create new user
+    # Create new user (None if username or email is taken)
     user = await crud.create_user(
         db=db,
         username=user_data.username,
@@ -188,6 +244,14 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
         full_name=user_data.full_name
     )
     
+    if user is None:
+        # Only on conflict: find out which field was taken
+        existing_user = await crud.get_user_by_username(db, user_data.username)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered" if existing_user else "Email already registered"
+        )
+    
     return UserResponse(**user.to_dict())
 
 
@@ -219,16 +283,135 @@ async def get_current_user_info(current_user: User = Depends(get_current_active_
 
 # ==================== QUEST GENERATION ====================
 
-@app.post("/api/generate-quest", response_model=ImpactQuest)
+def generated_quest_row(
+    result: Dict,
+    request: QuestRequest,
+    current_user: User
+) -> Dict:
+    """crud.create_quest arguments for a generated quest (with its location metadata)"""
+    quest = result["quest"]
+    
+    return dict(
+        quest_id=quest.quest_id,
+        title=quest.title,
+        description=quest.description,
+        category=quest.category,
+        difficulty=quest.difficulty,
+        location_lat=quest.location.lat,
+        location_lng=quest.location.lng,
+        impact_metric=quest.impact_metric,
+        estimated_time=quest.estimated_time,
+        community_benefit=quest.community_benefit,
+        created_by=current_user.id,
+        assigned_to=None if request.make_public else current_user.id,
+        location_name=result.get("location_name"),
+        location_address=result.get("location_address")
+    )
+
+
+async def save_generated_quest(
+    db: AsyncSession,
+    result: Dict,
+    request: QuestRequest,
+    current_user: User
+) -> ImpactQuest:
+    """Persist a generated quest (with its location metadata) for the current user"""
+    quest = result["quest"]
+    location_name = result.get("location_name")
+    
+    # Save to database with location metadata
+    await crud.create_quest(db, **generated_quest_row(result, request, current_user))
+    
+    logger.info(
+        "✅ Quest saved to database: %s (%s, %s)",
+        quest.quest_id, quest.title, location_name or 'no location name'
+    )
+    
+    return quest
+
+
+# Offline (interactive=False) generations go through the Gemini Batch API,
+# which takes minutes to hours: longer than clients and proxies wait, and a
+# dropped connection would cancel the handler and abandon the paid job. They
+# run in background tasks that save the quests themselves; the request
+# returns 202 with a job to poll. Jobs are tracked in this worker's memory.
+GENERATION_JOB_TTL_S = 24 * 3600
+GENERATION_JOBS_MAX = 1024
+_GENERATION_JOBS: "OrderedDict[str, Dict]" = OrderedDict()
+_GENERATION_TASKS: Set[asyncio.Task] = set()  # Strong references until done
+
+
+def start_generation_job(
+    architect: CommunityArchitect,
+    requests: List[QuestRequest],
+    current_user: User
+) -> Dict:
+    """Generate and save `requests` as one Batch API job in a background task"""
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "pending",
+        "user_id": current_user.id,
+        "quests": [],
+        "detail": None,
+        "expires_at": time.monotonic() + GENERATION_JOB_TTL_S
+    }
+    _GENERATION_JOBS[job["job_id"]] = job
+    while len(_GENERATION_JOBS) > GENERATION_JOBS_MAX:
+        _GENERATION_JOBS.popitem(last=False)
+    
+    task = asyncio.create_task(run_generation_job(job, architect, requests, current_user))
+    _GENERATION_TASKS.add(task)
+    task.add_done_callback(_GENERATION_TASKS.discard)
+    return job
+
+
+async def run_generation_job(
+    job: Dict,
+    architect: CommunityArchitect,
+    requests: List[QuestRequest],
+    current_user: User
+) -> None:
+    """Body of a generation job: batch generation, then one INSERT/transaction"""
+    try:
+        results = await architect.generate_quests_batch(requests)
+        # Own session: the request that started the job is long gone
+        async with AsyncSessionLocal() as db:
+            await crud.bulk_create_quests(db, [
+                generated_quest_row(result, request, current_user)
+                for result, request in zip(results, requests)
+            ])
+        job["quests"] = [result["quest"].model_dump(mode="json") for result in results]
+        job["status"] = "done"
+        logger.info("✅ Generation job %s: %d quests saved to database", job["job_id"], len(results))
+    except Exception as e:
+        logger.exception("❌ Generation job %s failed", job["job_id"])
+        job["status"] = "failed"
+        job["detail"] = f"Failed to generate quests: {str(e)}"
+
+
+def generation_job_response(job: Dict) -> Dict:
+    """Public view of a generation job"""
+    return {key: job[key] for key in ("job_id", "status", "quests", "detail")}
+
+
+@app.post("/api/generate-quest", response_model=ImpactQuest, responses={202: {"description": "Generation job started"}})
 async def generate_quest(
     request: QuestRequest,
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    architect: CommunityArchitect = Depends(get_architect)
 ):
     """
     Generate a community impact quest using AI and save to database
     Now powered by Google Maps for accurate location data
+    
+    With interactive=False the quest is generated by a background Batch API
+    job: the response is 202 with the job (poll /api/generate-quests/jobs/{job_id}).
     """
+    if not request.interactive:
+        job = start_generation_job(architect, [request], current_user)
+        return ORJSONResponse(generation_job_response(job), status_code=status.HTTP_202_ACCEPTED)
+    
     try:
         # Generate quest with AI (returns Dict with quest + location metadata)
         result = await architect.generate_quest(
@@ -237,48 +420,148 @@ async def generate_quest(
             user_preferences=request.user_preferences
         )
         
-        # Extract quest and location data
-        quest = result["quest"]
-        location_name = result.get("location_name")
-        location_address = result.get("location_address")
-        
-        print(f"✅ Quest generated: {quest.title}")
-        if location_name:
-            print(f"   📍 Location: {location_name}")
+        quest = await save_generated_quest(db, result, request, current_user)
+        # Already a validated ImpactQuest: serialize it directly instead of
+        # letting FastAPI validate it against response_model again
+        return Response(quest.model_dump_json(), media_type="application/json")
         
-        # Save to database with location metadata
-        db_quest = await crud.create_quest(
-            db=db,
-            quest_id=quest.quest_id,
-            title=quest.title,
-            description=quest.description,
-            category=quest.category,
-            difficulty=quest.difficulty,
-            location_lat=quest.location.lat,
-            location_lng=quest.location.lng,
-            impact_metric=quest.impact_metric,
-            estimated_time=quest.estimated_time,
-            community_benefit=quest.community_benefit,
-            created_by=current_user.id,
-            assigned_to=None if request.make_public else current_user.id,
-            location_name=location_name,  # NEW
-            location_address=location_address  # NEW
+    except Exception as e:
+        logger.exception("❌ Quest generation error")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate quest: {str(e)}"
         )
+
+
+@app.post("/api/generate-quest/stream")
+async def generate_quest_stream(
+    request: QuestRequest,
+    current_user: User = Depends(get_current_active_user),
+    architect: CommunityArchitect = Depends(get_architect)
+):
+    """
+    Generate a quest and stream it as Server-Sent Events
+    
+    Events:
+        field: {"<name>": <value>} as soon as Gemini emits each quest field
+               (all at once for cached quests)
+        reset: {} discard the fields received so far; a retry or fallback
+               sends its own
+        quest: the saved ImpactQuest once generation is complete
+        error: {"detail": "..."} if generation fails
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def on_field(name, value):
+        await events.put(("reset", {}) if name is None else ("field", {name: value}))
+    
+    async def run():
+        try:
+            result = await architect.generate_quest(
+                coordinates=request.coordinates,
+                resolution_category=request.resolution_category,
+                user_preferences=request.user_preferences,
+                on_field=on_field
+            )
+            # Own session: the request-scoped one may be closed while streaming
+            async with AsyncSessionLocal() as db:
+                quest = await save_generated_quest(db, result, request, current_user)
+            await events.put(("quest", quest.model_dump(mode="json")))
+        except Exception as e:
+            logger.exception("❌ Quest generation error")
+            await events.put(("error", {"detail": f"Failed to generate quest: {str(e)}"}))
+        finally:
+            await events.put(None)
+    
+    async def event_stream():
+        task = asyncio.create_task(run())
+        try:
+            while (item := await events.get()) is not None:
+                event, data = item
+                yield b"event: %s\ndata: %s\n\n" % (event.encode(), orjson.dumps(data))
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/api/generate-quests/batch", response_model=List[ImpactQuest], responses={202: {"description": "Generation job started"}})
+async def generate_quests_batch(
+    requests: List[QuestRequest],
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    architect: CommunityArchitect = Depends(get_architect)
+):
+    """
+    Generate and save several quests at once (seeding, regenerations)
+    
+    Interactive requests are generated online and returned; the rest are
+    sent together as one Gemini Batch API job, which is cheaper but can take
+    minutes to hours, so it runs in the background. If there are any, the
+    response is 202: {"quests": [online quests], "job": <generation job>}
+    (poll /api/generate-quests/jobs/{job_id}).
+    """
+    online = [request for request in requests if request.interactive]
+    offline = [request for request in requests if not request.interactive]
+    
+    try:
+        results = await asyncio.gather(*(
+            architect.generate_quest(
+                coordinates=request.coordinates,
+                resolution_category=request.resolution_category,
+                user_preferences=request.user_preferences
+            )
+            for request in online
+        ))
+        
+        # All rows in one INSERT/transaction
+        await crud.bulk_create_quests(db, [
+            generated_quest_row(result, request, current_user)
+            for result, request in zip(results, online)
+        ])
+        logger.info("✅ %d quests saved to database", len(results))
         
-        print(f"✅ Quest saved to database: {quest.quest_id}")
+        quests = [result["quest"] for result in results]
+        if not offline:
+            return quests
         
-        return quest
+        job = start_generation_job(architect, offline, current_user)
+        return ORJSONResponse(
+            {
+                "quests": [quest.model_dump(mode="json") for quest in quests],
+                "job": generation_job_response(job)
+            },
+            status_code=status.HTTP_202_ACCEPTED
+        )
         
     except Exception as e:
-        print(f"❌ Quest generation error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Batch quest generation error")
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to generate quest: {str(e)}"
+            detail=f"Failed to generate quests: {str(e)}"
         )
 
 
+@app.get("/api/generate-quests/jobs/{job_id}")
+async def get_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Status of a background generation job: pending, done (with the saved
+    quests) or failed (with detail)
+    """
+    job = _GENERATION_JOBS.get(job_id)
+    if job is not None and job["expires_at"] <= time.monotonic():
+        del _GENERATION_JOBS[job_id]
+        job = None
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    
+    return generation_job_response(job)
+
+
 # ==================== QUEST MANAGEMENT ====================
 
 @app.get("/api/quests/my")
@@ -289,7 +572,7 @@ async def get_my_quests(
 ):
     """Get quests assigned to current user"""
     quests = await crud.get_quests_by_user(db, current_user.id, status)
-    return [quest.to_dict() for quest in quests]
+    return ORJSONResponse(quests)
 
 
 # ==================== COMMUNITY QUEST MARKETPLACE ====================
@@ -305,7 +588,7 @@ async def get_community_quests(
 ):
     """Get public quests available for the community to claim"""
     quests = await crud.get_community_quests(db, category, difficulty)
-    return [quest.to_dict() for quest in quests]
+    return ORJSONResponse(quests)
 
 
 @app.get("/api/quests/created-by-me")
@@ -315,7 +598,7 @@ async def get_my_created_quests(
 ):
     """Get quests created by current user (to track your impact as creator)"""
     quests = await crud.get_quests_created_by_user(db, current_user.id)
-    return [quest.to_dict() for quest in quests]
+    return ORJSONResponse(quests)
 
 
 @app.get("/api/quests/all")
@@ -330,8 +613,8 @@ async def get_all_quests_for_map(
     Note: This shows all quests but only public quests (assigned_to=NULL) can be claimed.
     Private quests are visible but locked to their creator.
     """
-    quests = await crud.get_all_quests(db, category, difficulty)
-    return [quest.to_dict() for quest in quests]
+    quests = await crud.get_all_quests(db, category=category, difficulty=difficulty)
+    return ORJSONResponse(quests)
 
 
 # ==================== QUEST MANAGEMENT (Generic Routes) ====================
@@ -389,8 +672,7 @@ async def claim_quest(
     # Assign quest to current user
     quest.assigned_to = current_user.id
     quest.status = "Active"
-    await db.commit()
-    await db.refresh(quest)
+    await db.commit()  # expire_on_commit=False: quest keeps the values just set
     
     return {
         "message": "Quest claimed successfully!",
@@ -426,8 +708,7 @@ async def toggle_quest_public(
         # Make private - assign to creator
         quest.assigned_to = current_user.id
     
-    await db.commit()
-    await db.refresh(quest)
+    await db.commit()  # expire_on_commit=False: quest keeps the values just set
     
     return {
         "message": f"Quest is now {'public' if make_public else 'private'}",
@@ -437,74 +718,206 @@ async def toggle_quest_public(
 
 # ==================== IMAGE VERIFICATION ====================
 
+# Most proofs accepted by one /api/verify-quest-proof/batch call
+MAX_PROOFS_PER_BATCH = 10
+
+
+async def record_verification(
+    db: AsyncSession,
+    quest_id: str,
+    user_id: str,
+    relative_path: str,
+    description: str,
+    image_hash: Optional[int],
+    verification_result: Dict
+) -> QuestSubmission:
+    """
+    Add a proof's submission record and, if verified, award its points and
+    complete the quest. Nothing is committed; the caller commits.
+    """
+    submission = await crud.create_submission(
+        db=db,
+        quest_id=quest_id,
+        user_id=user_id,
+        image_path=relative_path,
+        description=description,
+        image_hash=image_hash,
+        commit=False
+    )
+    return await crud.apply_verification(db, submission, verification_result, commit=False)
+
+
+def duplicate_verification() -> Dict:
+    """Verdict for a photo matching another user's recent proof (no Gemini call)"""
+    return {
+        "confidence_score": 0.0,
+        "verification_result": "Rejected",
+        "reasoning": "This photo matches a recent submission by another user. Please submit your own photo of the completed quest.",
+        "suggested_points": 0,
+        "key_observations": []
+    }
+
+
+def verification_response(submission, verification_result: Dict) -> Dict:
+    """Submission record plus the verifier's key observations"""
+    return {
+        **submission.to_dict(),
+        "key_observations": verification_result.get("key_observations", [])
+    }
+
+
 @app.post("/api/verify-quest-proof")
 async def verify_quest_proof(
     quest_id: str = Form(...),
     image: UploadFile = File(...),
     description: str = Form(""),
+    verify_later: bool = Form(False),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    verifier: VisionVerifier = Depends(get_verifier)
 ):
     """
     Verify quest completion using image analysis with Gemini Vision
+    
+    With verify_later, the proof is stored as a Pending submission and
+    verified later through the (half-price) Gemini Batch API by
+    verify_pending_submissions.py.
+    
+    A photo perceptually matching another user's recent proof is rejected
+    straight away, without a Gemini call.
     """
     try:
-        # Validate image file
-        await validate_image_file(image)
-        
         # Get quest details
         quest = await crud.get_quest_by_id(db, quest_id)
         if not quest:
             raise HTTPException(status_code=404, detail="Quest not found")
         
-        # Save uploaded image
-        file_path, relative_path = await save_upload_file(image, quest_id, current_user.id)
+        # Validate and save uploaded image
+        file_path, relative_path = await accept_upload(image, quest_id, current_user.id)
+        image_hash = await run_image_task(verifier.image_hash, file_path)
+        duplicate_of = await crud.find_duplicate_submission(db, image_hash, current_user.id)
         
-        # Verify with AI
-        verification_result = await verifier.verify_quest_proof(
-            image_path=file_path,
-            quest_title=quest.title,
-            quest_description=quest.description,
-            quest_category=quest.category,
-            user_description=description
+        if duplicate_of:
+            logger.info("🚫 Proof for %s duplicates submission %s", quest_id, duplicate_of)
+            verification_result = duplicate_verification()
+        elif verify_later:
+            submission = await crud.create_submission(
+                db=db,
+                quest_id=quest_id,
+                user_id=current_user.id,
+                image_path=relative_path,
+                description=description,
+                image_hash=image_hash
+            )
+            return {**submission.to_dict(), "key_observations": []}
+        else:
+            # Verify with AI
+            verification_result = await verifier.verify_quest_proof(
+                image_path=file_path,
+                quest_title=quest.title,
+                quest_description=quest.description,
+                quest_category=quest.category,
+                user_description=description
+            )
+        
+        # Record the submission and any award in one transaction (one commit);
+        # a single session runs statements one at a time, so these stay sequential
+        submission = await record_verification(
+            db, quest_id, current_user.id, relative_path, description, image_hash, verification_result
         )
+        await db.commit()
+        
+        return verification_response(submission, verification_result)
         
-        # Create submission record
-        submission = await crud.create_submission(
-            db=db,
-            quest_id=quest_id,
-            user_id=current_user.id,
-            image_path=relative_path,
-            description=description,
-            confidence_score=verification_result["confidence_score"],
-            verification_result=verification_result["verification_result"],
-            ai_reasoning=verification_result["reasoning"],
-            points_awarded=verification_result["suggested_points"]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to verify quest proof: {str(e)}"
         )
+
+
+@app.post("/api/verify-quest-proof/batch")
+async def verify_quest_proofs_batch(
+    quest_ids: List[str] = Form(...),
+    images: List[UploadFile] = File(...),
+    descriptions: List[str] = Form([]),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    verifier: VisionVerifier = Depends(get_verifier)
+):
+    """
+    Verify several quest proofs at once (the i-th image proves the i-th quest)
+    
+    The Gemini Vision calls run concurrently, so the batch takes about as long
+    as its slowest proof; all submissions are recorded in one transaction.
+    """
+    if len(quest_ids) != len(images):
+        raise HTTPException(status_code=400, detail="Provide one quest_id per image")
+    if len(images) > MAX_PROOFS_PER_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PROOFS_PER_BATCH} proofs per batch")
+    descriptions = descriptions + [""] * (len(images) - len(descriptions))
+    
+    try:
+        # Get quest details
+        quests = []
+        for quest_id in quest_ids:
+            quest = await crud.get_quest_by_id(db, quest_id)
+            if not quest:
+                raise HTTPException(status_code=404, detail=f"Quest not found: {quest_id}")
+            quests.append(quest)
+        
+        # Validate and save uploaded images
+        paths = [
+            await accept_upload(image, quest.quest_id, current_user.id)
+            for image, quest in zip(images, quests)
+        ]
+        
+        # Photos matching another user's recent proof are rejected unverified
+        image_hashes = await asyncio.gather(*(
+            run_image_task(verifier.image_hash, file_path) for file_path, _ in paths
+        ))
+        duplicates = [
+            await crud.find_duplicate_submission(db, image_hash, current_user.id)
+            for image_hash in image_hashes
+        ]
         
-        # Award points if verified
-        if verification_result["verification_result"] == "Verified":
-            await crud.update_user_points(
-                db,
-                current_user.id,
-                verification_result["suggested_points"],
-                increment_quests=True
+        # Verify the rest with AI, all proofs concurrently
+        verified = iter(await verifier.verify_batch([
+            dict(
+                image_path=file_path,
+                quest_title=quest.title,
+                quest_description=quest.description,
+                quest_category=quest.category,
+                user_description=description
             )
-            
-            # Update quest status to completed
-            await crud.update_quest_status(db, quest_id, "Completed")
+            for (file_path, _), quest, description, duplicate_of in zip(paths, quests, descriptions, duplicates)
+            if not duplicate_of
+        ]))
+        verification_results = [
+            duplicate_verification() if duplicate_of else next(verified)
+            for duplicate_of in duplicates
+        ]
         
-        return {
-            **submission.to_dict(),
-            "key_observations": verification_result.get("key_observations", [])
-        }
+        responses = []
+        for quest, (_, relative_path), description, image_hash, verification_result in zip(
+            quests, paths, descriptions, image_hashes, verification_results
+        ):
+            submission = await record_verification(
+                db, quest.quest_id, current_user.id, relative_path, description, image_hash, verification_result
+            )
+            responses.append((submission, verification_result))
+        await db.commit()
+        
+        return [verification_response(*response) for response in responses]
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to verify quest proof: {str(e)}"
+            detail=f"Failed to verify quest proofs: {str(e)}"
         )
 
 
@@ -517,7 +930,7 @@ async def get_my_submissions(
 ):
     """Get all submissions by current user"""
     submissions = await crud.get_submissions_by_user(db, current_user.id)
-    return [sub.to_dict() for sub in submissions]
+    return ORJSONResponse(submissions)
 
 
 @app.get("/api/quests/{quest_id}/submissions")
@@ -528,7 +941,7 @@ async def get_quest_submissions(
 ):
     """Get all submissions for a specific quest"""
     submissions = await crud.get_submissions_by_quest(db, quest_id)
-    return [sub.to_dict() for sub in submissions]
+    return ORJSONResponse(submissions)
 
 
 # ==================== LEADERBOARD ====================
@@ -540,28 +953,28 @@ async def get_leaderboard(
 ):
     """Get top users by points"""
     users = await crud.get_leaderboard(db, limit)
-    return [user.to_dict() for user in users]
+    return ORJSONResponse(users)
 
 
 # ==================== LEGACY EVALUATION ENDPOINT ====================
 
 @app.post("/api/evaluate-quest")
-async def evaluate_quest(quest: ImpactQuest):
+async def evaluate_quest(
+    quest: ImpactQuest,
+    evaluator: CombinedEvaluator = Depends(get_evaluator)
+):
     """
     Evaluate a quest using LLM-as-a-judge for safety and appropriateness
     (Legacy endpoint - kept for backward compatibility)
     """
     try:
-        # Initialize evaluators
-        safety_eval = SafetyEvaluator()
-        appropriateness_eval = AppropriatenessEvaluator()
-        
-        # Convert quest to JSON string for evaluation
-        quest_json = quest.model_dump_json(indent=2)
+        # Convert quest to JSON string for evaluation (compact: indentation is billed tokens)
+        quest_json = quest.model_dump_json()
         
-        # Run evaluations
-        safety_score = safety_eval.score(quest_json)
-        appropriateness_score = appropriateness_eval.score(quest_json)
+        # Run both evaluations in one Gemini call
+        scores = await evaluator.ascore(quest_json)
+        safety_score = scores["safety"]
+        appropriateness_score = scores["appropriateness"]
         
         return {
             "quest_id": quest.quest_id,
@@ -588,5 +1001,20 @@ async def evaluate_quest(quest: ImpactQuest):
 # ==================== SERVER ENTRY POINT ====================
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    
+    # DEV=1 turns on auto-reload (watcher process, dev only). Reload can't be
+    # combined with WEB_CONCURRENCY > 1; uvicorn ignores workers when reloading.
+    # One worker by default: Gemini rate limits and in-memory caches are per
+    # process, so each extra worker gets the full per-minute quota.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        reload=os.getenv("DEV") == "1",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        # uvloop + httptools from uvicorn[standard]; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
@@ -1,11 +1,37 @@
 """
-Database migration script to add location_name and location_address columns
+Database migration script to add location_name and location_address columns,
+add quest_submissions.image_hash and turn users.impact_level into a generated column
 Run this to update existing database schema
 """
 
 import sqlite3
 import os
 
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import _set_sqlite_pragmas
+from db_models import User
+
+
+def rebuild_users_table(cursor):
+    """
+    Recreate users with impact_level as a GENERATED column
+    
+    SQLite can't alter a column into a generated one, so this follows its
+    create-copy-drop-rename procedure (foreign keys must be off).
+    """
+    columns = [c.name for c in User.__table__.columns if c.name != "impact_level"]
+    column_list = ", ".join(columns)
+    create_table = str(CreateTable(User.__table__).compile(dialect=sqlite.dialect()))
+    
+    cursor.execute(create_table.replace("CREATE TABLE users", "CREATE TABLE users_new", 1))
+    cursor.execute(f"INSERT INTO users_new ({column_list}) SELECT {column_list} FROM users")
+    cursor.execute("DROP TABLE users")
+    cursor.execute("ALTER TABLE users_new RENAME TO users")
+    for index in User.__table__.indexes:
+        cursor.execute(str(CreateIndex(index).compile(dialect=sqlite.dialect())))
+
 def migrate_database():
     """Add new location columns to quests table"""
     
@@ -17,11 +43,18 @@ def migrate_database():
     
     print(f"📊 Migrating database: {db_path}")
     
-    conn = sqlite3.connect(db_path)
+    # isolation_level=None: sqlite3 won't open transactions on its own (it
+    # never does before DDL, so each ALTER would commit separately); the
+    # explicit BEGIN below makes the whole migration one transaction.
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    _set_sqlite_pragmas(conn)  # WAL + synchronous=NORMAL, like the app's connections
+    conn.execute("PRAGMA foreign_keys = OFF")  # No effect inside a transaction
     cursor = conn.cursor()
     
     try:
-        # Check if columns already exist
+        cursor.execute("BEGIN")
+        
+        # Check if columns already exist (SQLite has no ADD COLUMN IF NOT EXISTS)
         cursor.execute("PRAGMA table_info(quests)")
         columns = [row[1] for row in cursor.fetchall()]
         
@@ -47,6 +80,31 @@ def migrate_database():
         else:
             print("   ℹ️  Column location_address already exists")
         
+        # Add image_hash (duplicate-photo detection) if it doesn't exist
+        cursor.execute("PRAGMA table_info(quest_submissions)")
+        submission_columns = [row[1] for row in cursor.fetchall()]
+        
+        if 'image_hash' not in submission_columns:
+            print("   Adding column: image_hash")
+            cursor.execute("""
+                ALTER TABLE quest_submissions
+                ADD COLUMN image_hash INTEGER
+            """)
+            print("   ✅ Added image_hash")
+        else:
+            print("   ℹ️  Column image_hash already exists")
+        
+        # Make impact_level a generated column (hidden=3: stored generated)
+        cursor.execute("PRAGMA table_xinfo(users)")
+        hidden = {row[1]: row[6] for row in cursor.fetchall()}
+        
+        if hidden.get("impact_level") != 3:
+            print("   Rebuilding users: generated impact_level")
+            rebuild_users_table(cursor)
+            print("   ✅ impact_level now follows points")
+        else:
+            print("   ℹ️  Column impact_level already generated")
+        
         conn.commit()
         print("\n✅ Database migration completed successfully!")
         
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional
 from enum import Enum
 
@@ -26,16 +26,19 @@ class QuestRequest(BaseModel):
     resolution_category: ResolutionCategory
     user_preferences: Optional[str] = Field(None, description="Optional user preferences or constraints")
     make_public: bool = Field(False, description="If True, quest is public for community; if False, assigned to creator")
+    interactive: bool = Field(True, description="If False, generate through the Gemini Batch API (cheaper, but can take minutes)")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "coordinates": {"lat": 7.3775, "lng": 3.9470},
                 "resolution_category": "Environment",
                 "user_preferences": "I prefer outdoor activities and have weekends free",
-                "make_public": False
+                "make_public": False,
+                "interactive": True
             }
         }
+    )
 
 class ImpactQuest(BaseModel):
     """Generated impact quest"""
@@ -49,8 +52,8 @@ class ImpactQuest(BaseModel):
     estimated_time: Optional[str] = Field(None, description="Estimated time to complete")
     community_benefit: Optional[str] = Field(None, description="Description of community benefit")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "quest_id": "quest_12345",
                 "title": "Clean Up Bodija Park",
@@ -63,6 +66,30 @@ class ImpactQuest(BaseModel):
                 "community_benefit": "Improved recreational space for 200+ families"
             }
         }
+    )
+
+class QuestSchema(BaseModel):
+    """
+    Structured output Gemini returns for a quest (passed as response_schema)
+    impact_metric is declared last so that stopping the stream once the
+    required fields are in still keeps the optional ones
+    """
+    title: str = Field(..., min_length=5, max_length=100)
+    description: str = Field(..., min_length=20)
+    difficulty: Difficulty
+    estimated_time: Optional[str] = None
+    community_benefit: Optional[str] = None
+    impact_metric: str
+
+class LocationQuestSchema(BaseModel):
+    """QuestSchema plus the index of the nearby place Gemini picked"""
+    selected_location_index: int = Field(..., ge=0, le=2, description="Index of chosen location (0-2)")
+    title: str = Field(..., min_length=5, max_length=100)
+    description: str = Field(..., min_length=20)
+    difficulty: Difficulty
+    estimated_time: Optional[str] = None
+    community_benefit: Optional[str] = None
+    impact_metric: str
 
 class StatusUpdate(BaseModel):
     """Model for updating quest status"""
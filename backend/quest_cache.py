@@ -0,0 +1,423 @@
+"""
+Response cache for AI quest generation.
+
+Two-tier lookup in front of CommunityArchitect.generate_quest:
+1. Exact match on a canonicalized request hash (prompt version, category,
+   coordinates snapped to a ~100m grid, user preferences)
+2. Semantic match: cosine similarity between preference embeddings of
+   cached quests in the same category and neighbourhood
+
+PlacesCache keeps Google Places results per ~1km tile and category for an
+hour, so nearby requests from different users share one Places lookup.
+
+Both are backed by SQLite (the shared commupath.db connection from
+database.get_conn) so entries survive restarts. Their lookups are async:
+the in-memory tiers answer on the event loop, and SQLite reads, writes and
+the similarity scan run in a worker thread (asyncio.to_thread).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import operator
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import fields
+from typing import Dict, List, Optional, Tuple
+
+from database import get_conn
+from location_service import FormattedPlace
+from models import Coordinates
+
+logger = logging.getLogger(__name__)
+
+# Cached quests expire after 7 days
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Recently served exact-match entries are also kept in memory (L1)
+RECENT_TTL_SECONDS = 5 * 60
+RECENT_MAX_ENTRIES = 512
+
+# Minimum cosine similarity for a semantic cache hit
+SIMILARITY_THRESHOLD = 0.92
+
+# Coordinates are rounded to 3 decimals (~100m) before hashing
+GRID_DECIMALS = 3
+
+# Half-width of the bounding box searched for semantic candidates (~1km)
+NEIGHBOURHOOD_DEGREES = 0.01
+
+# Most candidates (newest first) compared per semantic lookup, bounding the
+# scan over 768-d embeddings in busy neighbourhoods
+SEMANTIC_MAX_CANDIDATES = 200
+
+
+class QuestCache:
+    """
+    SQLite-backed exact + semantic cache for generated quests
+
+    Stores the serialized generation result (quest + location metadata)
+    together with the embedding of the user preferences that produced it.
+    Exact-match hits from the last few minutes are answered from an
+    in-memory LRU before touching SQLite.
+    """
+
+    def __init__(
+        self,
+        conn: Optional[sqlite3.Connection] = None,
+        ttl_seconds: int = CACHE_TTL_SECONDS
+    ):
+        """Create the cache table if needed (on the shared connection by default)"""
+        self.ttl_seconds = ttl_seconds
+        self._recent: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.conn = conn or get_conn()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS quest_cache (
+                input_hash TEXT PRIMARY KEY,
+                prompt_version TEXT,
+                category TEXT,
+                lat REAL,
+                lng REAL,
+                embedding BLOB,
+                response_json TEXT,
+                created_at INT,
+                expires_at INT
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_quest_cache_category_version
+            ON quest_cache(category, prompt_version)
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(
+        prompt_version: str,
+        category: str,
+        lat: float,
+        lng: float,
+        user_preferences: Optional[str]
+    ) -> str:
+        """
+        Build the exact-match cache key for a generation request
+
+        Coordinates are snapped to a ~100m grid so clicks on the same
+        spot of the map share one entry.
+        """
+        raw = (
+            f"{prompt_version}|{category}|"
+            f"{round(lat, GRID_DECIMALS)}|{round(lng, GRID_DECIMALS)}|"
+            f"{user_preferences or ''}"
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, input_hash: str) -> Optional[str]:
+        """Return the cached response JSON for an exact key, if still fresh"""
+        now = time.time()
+
+        entry = self._recent.get(input_hash)
+        if entry is not None:
+            expires_at, response_json = entry
+            if expires_at > now:
+                self._recent.move_to_end(input_hash)
+                return response_json
+            del self._recent[input_hash]
+
+        row = await asyncio.to_thread(self._select, input_hash, int(now))
+        if row is None:
+            return None
+
+        self._remember(input_hash, row[0], now)
+        return row[0]
+
+    def _select(self, input_hash: str, now: int) -> Optional[Tuple[str]]:
+        """SQLite exact-match lookup (blocking: run it in a thread)"""
+        return self.conn.execute(
+            "SELECT response_json FROM quest_cache WHERE input_hash = ? AND expires_at > ?",
+            (input_hash, now)
+        ).fetchone()
+
+    def _remember(self, input_hash: str, response_json: str, now: float) -> None:
+        """Keep an exact-match entry in the in-memory LRU for RECENT_TTL_SECONDS"""
+        self._recent[input_hash] = (now + min(RECENT_TTL_SECONDS, self.ttl_seconds), response_json)
+        self._recent.move_to_end(input_hash)
+        while len(self._recent) > RECENT_MAX_ENTRIES:
+            self._recent.popitem(last=False)
+
+    async def find_similar(
+        self,
+        prompt_version: str,
+        category: str,
+        lat: float,
+        lng: float,
+        embedding: List[float]
+    ) -> Optional[str]:
+        """
+        Return the cached response JSON whose preference embedding is most
+        similar to `embedding`, among fresh entries in the same category
+        and neighbourhood. None if nothing reaches SIMILARITY_THRESHOLD.
+
+        Only the SEMANTIC_MAX_CANDIDATES newest candidates are compared; the
+        query and scan run in a thread.
+        """
+        return await asyncio.to_thread(self._find_similar, prompt_version, category, lat, lng, embedding)
+
+    def _find_similar(
+        self,
+        prompt_version: str,
+        category: str,
+        lat: float,
+        lng: float,
+        embedding: List[float]
+    ) -> Optional[str]:
+        """find_similar's SQLite query and scan (blocking: run it in a thread)"""
+        query_norm = _norm(embedding)
+        if not query_norm:
+            return None
+
+        rows = self.conn.execute(
+            """
+            SELECT embedding, response_json FROM quest_cache
+            WHERE category = ? AND prompt_version = ?
+              AND expires_at > ?
+              AND embedding IS NOT NULL
+              AND lat BETWEEN ? AND ?
+              AND lng BETWEEN ? AND ?
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (
+                category,
+                prompt_version,
+                int(time.time()),
+                lat - NEIGHBOURHOOD_DEGREES,
+                lat + NEIGHBOURHOOD_DEGREES,
+                lng - NEIGHBOURHOOD_DEGREES,
+                lng + NEIGHBOURHOOD_DEGREES,
+                SEMANTIC_MAX_CANDIDATES,
+            )
+        ).fetchall()
+
+        best_score = 0.0
+        best_response = None
+        for blob, response_json in rows:
+            candidate = array("f")
+            candidate.frombytes(blob)
+            score = _cosine_similarity(embedding, candidate, query_norm)
+            if score > best_score:
+                best_score, best_response = score, response_json
+
+        if best_score >= SIMILARITY_THRESHOLD:
+            logger.debug("Semantic cache hit (similarity %.3f)", best_score)
+            return best_response
+        return None
+
+    async def put(
+        self,
+        input_hash: str,
+        prompt_version: str,
+        category: str,
+        lat: float,
+        lng: float,
+        embedding: Optional[List[float]],
+        response_json: str
+    ) -> None:
+        """Store a generation result and drop expired entries"""
+        now = int(time.time())
+        self._remember(input_hash, response_json, now)
+        await asyncio.to_thread(
+            self._insert, input_hash, prompt_version, category, lat, lng, embedding, response_json, now
+        )
+
+    def _insert(
+        self,
+        input_hash: str,
+        prompt_version: str,
+        category: str,
+        lat: float,
+        lng: float,
+        embedding: Optional[List[float]],
+        response_json: str,
+        now: int
+    ) -> None:
+        """put's SQLite write and expiry sweep (blocking: run it in a thread)"""
+        blob = array("f", embedding).tobytes() if embedding else None
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO quest_cache
+                (input_hash, prompt_version, category, lat, lng,
+                 embedding, response_json, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                input_hash,
+                prompt_version,
+                category,
+                round(lat, GRID_DECIMALS),
+                round(lng, GRID_DECIMALS),
+                blob,
+                response_json,
+                now,
+                now + self.ttl_seconds,
+            )
+        )
+        self.conn.execute("DELETE FROM quest_cache WHERE expires_at <= ?", (now,))
+        self.conn.commit()
+
+
+# Places results are reused for an hour
+PLACES_TTL_SECONDS = 60 * 60
+
+# Coordinates are quantized to 0.01 degrees (~1km tiles) for places lookups
+PLACES_TILE_DECIMALS = 2
+
+# Maximum tiles kept in memory
+PLACES_MAX_ENTRIES = 10_000
+
+
+class PlacesCache:
+    """
+    TTL cache for nearby-place lookups keyed by (tile, category, radius)
+
+    Entries live in memory (LRU-bounded) and are written through to SQLite
+    so a restarted server starts warm. Per-key locks make concurrent misses
+    on the same tile wait for a single Places API call.
+    """
+
+    def __init__(
+        self,
+        conn: Optional[sqlite3.Connection] = None,
+        ttl_seconds: int = PLACES_TTL_SECONDS,
+        max_entries: int = PLACES_MAX_ENTRIES
+    ):
+        """Create the cache table if needed (on the shared connection by default)"""
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[FormattedPlace]]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.conn = conn or get_conn()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS places_cache (
+                tile_key TEXT PRIMARY KEY,
+                response_json TEXT,
+                created_at INT,
+                expires_at INT
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(lat: float, lng: float, category: str, radius: int) -> str:
+        """Cache key for a places lookup, with coordinates snapped to ~1km tiles"""
+        return (
+            f"{round(lat, PLACES_TILE_DECIMALS)}|{round(lng, PLACES_TILE_DECIMALS)}"
+            f"|{category}|{radius}"
+        )
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Lock guarding the fetch for one key (avoids a thundering herd)"""
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def release(self, key: str) -> None:
+        """Forget an idle per-key lock so the lock table doesn't grow forever"""
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+
+    async def get(self, key: str) -> Optional[List[FormattedPlace]]:
+        """Return cached places for a key (memory first, then SQLite in a thread)"""
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, places = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return places
+            del self._entries[key]
+
+        row = await asyncio.to_thread(self._select, key, int(now))
+        if not row:
+            return None
+
+        places = [_place_from_json(place) for place in json.loads(row[0])]
+        self._remember(key, row[1], places)
+        return places
+
+    def _select(self, key: str, now: int) -> Optional[Tuple[str, int]]:
+        """SQLite lookup (blocking: run it in a thread)"""
+        return self.conn.execute(
+            "SELECT response_json, expires_at FROM places_cache WHERE tile_key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+
+    async def put(self, key: str, places: List[FormattedPlace]) -> None:
+        """Store places for a key in memory and SQLite (written in a thread)"""
+        now = int(time.time())
+        expires_at = now + self.ttl_seconds
+        self._remember(key, expires_at, places)
+        response_json = json.dumps([_place_to_json(place) for place in places])
+        await asyncio.to_thread(self._insert, key, response_json, now, expires_at)
+
+    def _insert(self, key: str, response_json: str, now: int, expires_at: int) -> None:
+        """put's SQLite write and expiry sweep (blocking: run it in a thread)"""
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO places_cache (tile_key, response_json, created_at, expires_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            (key, response_json, now, expires_at)
+        )
+        self.conn.execute("DELETE FROM places_cache WHERE expires_at <= ?", (now,))
+        self.conn.commit()
+
+    def _remember(self, key: str, expires_at: float, places: List[FormattedPlace]) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entries"""
+        self._entries[key] = (expires_at, places)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _place_to_json(place: FormattedPlace) -> Dict:
+    """Formatted place -> JSON-safe dict"""
+    data = {field.name: getattr(place, field.name) for field in fields(place)}
+    data["coordinates"] = place.coordinates.model_dump()
+    return data
+
+
+def _place_from_json(data: Dict) -> FormattedPlace:
+    """JSON dict -> formatted place (with Coordinates)"""
+    return FormattedPlace(**{
+        **data,
+        "coordinates": Coordinates(**data["coordinates"]),
+        "types": tuple(data.get("types", ()))
+    })
+
+
+def _norm(v) -> float:
+    """Euclidean length of a vector"""
+    return math.sqrt(sum(map(operator.mul, v, v)))
+
+
+def _cosine_similarity(a, b, norm_a: Optional[float] = None) -> float:
+    """
+    Cosine similarity between two equal-length vectors (`norm_a`: a's
+    precomputed length, when comparing one vector against many)
+
+    map(operator.mul) keeps the products in C, several times faster than a
+    generator expression over 768 dimensions.
+    """
+    if len(a) != len(b):
+        return 0.0
+    norm_a = norm_a if norm_a is not None else _norm(a)
+    norm_b = _norm(b)
+    if not norm_a or not norm_b:
+        return 0.0
+    return sum(map(operator.mul, a, b)) / (norm_a * norm_b)
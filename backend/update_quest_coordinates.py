@@ -11,10 +11,11 @@ Run: python update_quest_coordinates.py
 """
 
 import asyncio
-import sqlite3
 import os
+import aiosqlite
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from database import SQLITE_PRAGMAS, _sqlite_path, get_conn
 from location_service import LocationService
 from models import Coordinates
 
@@ -24,18 +25,25 @@ load_dotenv()
 # Default hardcoded coordinate that old quests likely have
 DEFAULT_COORDS = (7.3775, 3.9470)  # Ibadan center
 
+def count_quests() -> int:
+    """Total number of quests in the database"""
+    (total,) = get_conn().execute("SELECT COUNT(*) FROM quests").fetchone()
+    return total
+
 def get_quests_to_update() -> List[Dict]:
     """Get all quests from database that need coordinate updates"""
-    conn = sqlite3.connect('commupath.db')
-    cursor = conn.cursor()
+    cursor = get_conn().cursor()
     
-    # Get all quests
+    # Quests at (within ~1km of) the default coordinates or without a location
+    # name; SQLite filters, so only these rows come back
     cursor.execute("""
         SELECT quest_id, title, description, category, difficulty, 
                location_lat, location_lng, location_name, location_address
         FROM quests
+        WHERE (ABS(location_lat - ?) < 0.01 AND ABS(location_lng - ?) < 0.01)
+           OR location_name IS NULL OR location_name = ''
         ORDER BY created_at ASC
-    """)
+    """, DEFAULT_COORDS)
     
     quests = []
     for row in cursor.fetchall():
@@ -51,25 +59,24 @@ def get_quests_to_update() -> List[Dict]:
             'location_address': row[8]
         })
     
-    conn.close()
+    cursor.close()
     return quests
 
-def update_quest_location(quest_id: str, lat: float, lng: float, name: str, address: str):
-    """Update a quest's location in the database"""
-    conn = sqlite3.connect('commupath.db')
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        UPDATE quests 
-        SET location_lat = ?, 
-            location_lng = ?,
-            location_name = ?,
-            location_address = ?
-        WHERE quest_id = ?
-    """, (lat, lng, name, address, quest_id))
-    
-    conn.commit()
-    conn.close()
+async def update_quest_locations(rows: List[Tuple[float, float, str, str, str]]):
+    """Update quest locations, (lat, lng, name, address, quest_id) per row, in one transaction"""
+    # Same file get_conn() reads, so a custom DATABASE_URL is honoured
+    async with aiosqlite.connect(_sqlite_path()) as conn:
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+        await conn.executemany("""
+            UPDATE quests 
+            SET location_lat = ?, 
+                location_lng = ?,
+                location_name = ?,
+                location_address = ?
+            WHERE quest_id = ?
+        """, rows)
+        await conn.commit()
 
 async def assign_unique_locations(quests: List[Dict], location_service: LocationService):
     """Assign unique real locations to quests based on their category"""
@@ -91,22 +98,25 @@ async def assign_unique_locations(quests: List[Dict], location_service: Location
     for cat, cat_quests in quests_by_category.items():
         print(f"   {cat}: {len(cat_quests)} quests")
     
-    # Find nearby places for each category
+    # Find nearby places for each category (all categories at once)
     center = Coordinates(lat=DEFAULT_COORDS[0], lng=DEFAULT_COORDS[1])
+    categories = [category for category, cat_quests in quests_by_category.items() if cat_quests]
     
-    for category, cat_quests in quests_by_category.items():
-        if not cat_quests:
-            continue
-        
-        print(f"\n🔍 Finding {category} locations...")
-        
-        # Get nearby places for this category
-        nearby_places = await location_service.find_nearby_places(
+    print(f"\n🔍 Finding {', '.join(categories)} locations...")
+    places_by_category = await asyncio.gather(*(
+        location_service.find_nearby_places(
             center_coords=center,
             category=category,
             radius=5000,  # 5km radius
             max_results=20  # More options
         )
+        for category in categories
+    ))
+    
+    rows = []
+    
+    for category, nearby_places in zip(categories, places_by_category):
+        cat_quests = quests_by_category[category]
         
         if not nearby_places:
             print(f"   ⚠️  No places found for {category}, using default coordinates")
@@ -119,18 +129,20 @@ async def assign_unique_locations(quests: List[Dict], location_service: Location
             # Cycle through available places
             place = nearby_places[i % len(nearby_places)]
             
-            # Update quest coordinates
-            update_quest_location(
-                quest_id=quest['quest_id'],
-                lat=place['coordinates'].lat,
-                lng=place['coordinates'].lng,
-                name=place['name'],
-                address=place.get('address', '')
-            )
+            rows.append((
+                place.coordinates.lat,
+                place.coordinates.lng,
+                place.name,
+                place.address,
+                quest['quest_id']
+            ))
             
-            print(f"   📍 Updated '{quest['title'][:50]}...' → {place['name']}")
+            print(f"   📍 '{quest['title'][:50]}...' → {place.name}")
+    
+    # Update quest coordinates
+    await update_quest_locations(rows)
     
-    print("\n✅ All quests updated successfully!")
+    print(f"\n✅ {len(rows)} quests updated successfully!")
 
 async def main():
     """Main execution function"""
@@ -142,7 +154,7 @@ async def main():
     print("\n🔧 Initializing Google Maps service...")
     location_service = LocationService()
     
-    if not location_service.gmaps:
+    if not location_service.available:
         print("❌ Google Maps API not configured!")
         print("   Please set GOOGLE_MAPS_API_KEY in .env file")
         return
@@ -151,28 +163,23 @@ async def main():
     
     # Get quests to update
     print("\n📋 Fetching quests from database...")
-    quests = get_quests_to_update()
+    total_quests = count_quests()
     
-    if not quests:
+    if not total_quests:
         print("ℹ️  No quests found in database")
         return
     
-    print(f"✅ Found {len(quests)} total quests")
+    print(f"✅ Found {total_quests} total quests")
     
-    # Filter quests that need updating (default coords or no location name)
-    quests_to_update = [
-        q for q in quests 
-        if (abs(q['location_lat'] - DEFAULT_COORDS[0]) < 0.01 and 
-            abs(q['location_lng'] - DEFAULT_COORDS[1]) < 0.01) or 
-           not q['location_name']
-    ]
+    # Quests that need updating (default coords or no location name)
+    quests_to_update = get_quests_to_update()
     
     if not quests_to_update:
         print("\n✅ All quests already have unique coordinates!")
         return
     
     print(f"📝 {len(quests_to_update)} quests need coordinate updates")
-    print(f"✅ {len(quests) - len(quests_to_update)} quests already have unique locations")
+    print(f"✅ {total_quests - len(quests_to_update)} quests already have unique locations")
     
     # Ask for confirmation
     print("\n⚠️  This will update quest coordinates with real locations from Google Maps")
@@ -184,14 +191,15 @@ async def main():
     
     # Assign unique locations
     await assign_unique_locations(quests_to_update, location_service)
+    await location_service.aclose()
     
     print("\n" + "=" * 70)
     print("🎉 UPDATE COMPLETE!")
     print("=" * 70)
     print("\n📊 Summary:")
-    print(f"   • Total quests in database: {len(quests)}")
+    print(f"   • Total quests in database: {total_quests}")
     print(f"   • Quests updated: {len(quests_to_update)}")
-    print(f"   • Quests already unique: {len(quests) - len(quests_to_update)}")
+    print(f"   • Quests already unique: {total_quests - len(quests_to_update)}")
     print("\n💡 Refresh your browser to see quests at their new locations!")
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+Verify Pending quest submissions through the Gemini Batch API
+
+This script:
+1. Loads the oldest submissions still marked Pending (uploaded with verify_later)
+2. Verifies their images in Gemini Batch API jobs (half the price of live calls)
+3. Records each verdict, awarding points and completing verified quests
+
+Batch jobs can take minutes to hours, so run it from cron rather than
+waiting on it interactively.
+
+Run: python verify_pending_submissions.py [max_submissions]
+"""
+
+import asyncio
+import sys
+from dotenv import load_dotenv
+
+import crud
+from database import AsyncSessionLocal, close_db
+from vision_agent import VisionVerifier
+
+# Load environment variables
+load_dotenv()
+
+# Submissions verified per run
+DEFAULT_MAX_SUBMISSIONS = 100
+
+async def verify_pending_submissions(max_submissions: int = DEFAULT_MAX_SUBMISSIONS) -> int:
+    """Verify up to `max_submissions` Pending submissions; returns how many got a verdict"""
+    verifier = VisionVerifier()
+
+    async with AsyncSessionLocal() as db:
+        submissions = await crud.get_pending_submissions(db, limit=max_submissions)
+        if not submissions:
+            return 0
+
+        proofs = []
+        for submission in submissions:
+            quest = await crud.get_quest_by_id(db, submission.quest_id)
+            proofs.append(dict(
+                image_path=submission.image_path,
+                quest_title=quest.title if quest else "",
+                quest_description=quest.description if quest else "",
+                quest_category=quest.category if quest else "",
+                user_description=submission.description or ""
+            ))
+
+        print(f"🔍 Verifying {len(submissions)} pending submissions...")
+        verifications = await verifier.verify_batch_job(proofs)
+
+        # All verdicts and awards in one transaction; proofs that couldn't be
+        # verified stay Pending for the next run
+        verified = 0
+        for submission, verification in zip(submissions, verifications):
+            if verification is None:
+                print(f"   {submission.id}: not verified, left Pending")
+                continue
+            await crud.apply_verification(db, submission, verification, commit=False)
+            verified += 1
+            print(f"   {submission.id}: {verification['verification_result']} ({verification['suggested_points']} points)")
+        await db.commit()
+
+    return verified
+
+async def main():
+    """Main execution function"""
+    max_submissions = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MAX_SUBMISSIONS
+
+    try:
+        processed = await verify_pending_submissions(max_submissions)
+    finally:
+        await close_db()
+
+    if processed:
+        print(f"✅ {processed} submissions verified")
+    else:
+        print("ℹ️  No pending submissions")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,31 +1,215 @@
 """
 Vision Verifier Agent for CommuPath.
-Uses Gemini 2.5 Pro Vision to verify quest completion through image analysis.
+Uses Gemini 2.5 Flash to verify quest completion through image analysis,
+escalating ambiguous verdicts to Gemini 2.5 Pro.
 """
 
-import google.genai as genai
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import aiofiles
+import orjson
 from google.genai import types
 import os
-from typing import Dict, Any
-import base64
-from PIL import Image
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
 import io
 
+from gemini_client import approx_tokens, gemini_slot, get_client, run_batch_job, stream_json_object
+
+logger = logging.getLogger(__name__)
+
+# Gemini bills images by 768x768 tile (258 tokens each); budget a phone photo
+IMAGE_TOKEN_ESTIMATE = 4 * 258
+
+# Images are sent as JPEGs no larger than this on either side: enough
+# detail to judge a proof, and a 12MP photo shrinks to ~4 image tiles
+VISION_MAX_DIMENSION = 1024
+VISION_JPEG_QUALITY = 85
+
+# Formats Gemini accepts as-is (Pillow format name); other uploads (e.g. GIF)
+# are re-encoded as JPEG even when small enough
+GEMINI_IMAGE_FORMATS = frozenset({"JPEG", "PNG", "WEBP"})
+
+# Pillow decode/resize/encode runs here: off the event loop, and out of the
+# default executor that aiofiles shares, so a burst of large photos can't
+# stall file I/O. Pillow releases the GIL while decoding and resampling, so
+# one thread per core keeps every core busy.
+_IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="pillow")
+
+# Perceptual hash: one bit per horizontally adjacent pixel pair of a
+# (HASH_SIZE + 1) x HASH_SIZE grayscale thumbnail, 64 bits in all
+IMAGE_HASH_SIZE = 8
+# Thumbnails whose brightest and darkest pixels differ by less than this
+# (flat or low-contrast photos: a wall, the sky, a dark room) hash to
+# near-constant bits that "match" any other flat photo, so they get no hash
+IMAGE_HASH_MIN_CONTRAST = 16
+
+# Bump when the verification prompt or schema changes, so cached verdicts
+# from the old prompt stop matching
+VERIFICATION_PROMPT_VERSION = "v3"
+
+# Verdicts by hash of image bytes + quest + prompt version (LRU with expiry);
+# re-uploads of the same photo (retries, double submits) skip Gemini
+VERIFICATION_CACHE_SIZE = 1024
+VERIFICATION_CACHE_TTL_S = 7 * 24 * 3600
+_VERIFICATION_CACHE: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+# Static instructions, sent as the system instruction so every call shares
+# the same leading tokens (Gemini's implicit prefix caching keys on them);
+# only the quest details are built per call
+VERIFICATION_INSTRUCTION = """You are an expert AI verifier for community impact quests. Your job is to analyze an image submission and determine if it genuinely proves the completion of a quest.
+
+**YOUR TASK:**
+Carefully examine the image and evaluate the following, against the quest and user's description in the message:
+
+1. **Authenticity**: Does the image appear to be genuine (not AI-generated, not stock photo)?
+2. **Relevance**: Does the image directly relate to the quest objective?
+3. **Completion Evidence**: Does the image prove that the quest was actually completed?
+4. **Impact Quality**: Based on what you see, how significant is the community impact?
+5. **Safety & Appropriateness**: Is the content safe, appropriate, and aligned with positive community values?
+
+**VERIFICATION CRITERIA:**
+- ✅ **Verified** (confidence > 0.7): Clear evidence of quest completion with authentic, relevant proof
+- ⚠️  **Unclear** (confidence 0.3-0.7): Some evidence but missing key elements or unclear authenticity
+- ❌ **Rejected** (confidence < 0.3): No clear evidence, irrelevant image, or inappropriate content
+
+**POINTS CALCULATION:**
+- Exceptional impact with perfect evidence: 80-100 points
+- Good impact with solid evidence: 50-79 points
+- Moderate impact or partial evidence: 20-49 points
+- Minimal/unclear evidence: 0-19 points
+
+**IMPORTANT:**
+- Be encouraging but honest in your assessment
+- If unsure, provide constructive feedback on what's missing
+- Consider the quest category when evaluating impact
+- Reward genuine effort and authentic proof
+
+Provide your analysis in JSON format with confidence_score, verification_result, reasoning, suggested_points, and key_observations.
+"""
+
+# The decision is generated first (propertyOrdering); when its confidence is
+# within EARLY_EXIT_MARGIN of 0 or 1 the stream is cut there, skipping the
+# reasoning and observations
+DECISION_FIELDS = ("verification_result", "confidence_score", "suggested_points")
+EARLY_EXIT_MARGIN = 0.1
+
+# Confidence bands from VERIFICATION_INSTRUCTION: above VERIFIED_CONFIDENCE
+# is Verified, below REJECTED_CONFIDENCE is Rejected, Unclear in between. A
+# verdict whose label contradicts its confidence is relabelled to match it.
+VERIFIED_CONFIDENCE = 0.7
+REJECTED_CONFIDENCE = 0.3
+
+# Verdicts in this confidence band (or Unclear) from the primary (Flash) model
+# are re-run on the escalation (Pro) model
+ESCALATION_CONFIDENCE = (REJECTED_CONFIDENCE, VERIFIED_CONFIDENCE)
+
+# Batch API request: (proof index, cache key, image size in bytes, request)
+BatchItem = Tuple[int, bytes, int, types.InlinedRequest]
+
+# Observations are shown to the user; a handful is plenty and bounds output length
+MAX_KEY_OBSERVATIONS = 5
+
+# A full verdict (reasoning + observations) fits in ~300 tokens; the cap
+# bounds worst-case generation time. The decision fields come first, so a
+# truncated stream still yields a verdict.
+VERIFICATION_MAX_OUTPUT_TOKENS = 400
+
+# 2.5 Pro can't turn thinking off; this is its minimum budget
+ESCALATION_THINKING_BUDGET = 128
+
+# Structured verdict requested from Gemini Vision (static, built once). Every
+# field is required, numbers are bounded and extra keys are disallowed, so
+# constrained decoding has as few paths to explore as possible
+VERIFICATION_CONFIG = types.GenerateContentConfig(
+    system_instruction=VERIFICATION_INSTRUCTION,
+    temperature=0.3,  # Lower temp for consistent evaluation
+    max_output_tokens=VERIFICATION_MAX_OUTPUT_TOKENS,
+    thinking_config=types.ThinkingConfig(thinking_budget=0),  # A bounded judgment; no thinking needed
+    response_mime_type="application/json",
+    response_schema={
+        "type": "object",
+        "properties": {
+            "confidence_score": {
+                "type": "number",
+                "minimum": 0,
+                "maximum": 1,
+                "description": "Confidence from 0.0 to 1.0 that the image proves quest completion"
+            },
+            "verification_result": {
+                "type": "string",
+                "enum": ["Verified", "Rejected", "Unclear"],
+                "description": "Overall verification decision"
+            },
+            "reasoning": {
+                "type": "string",
+                "description": "Detailed explanation of the verification decision"
+            },
+            "suggested_points": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 100,
+                "description": "Points to award from 0 to 100 based on impact and completion quality"
+            },
+            "key_observations": {
+                "type": "array",
+                "items": {"type": "string"},
+                "maxItems": MAX_KEY_OBSERVATIONS,
+                "description": "List of key things observed in the image"
+            }
+        },
+        "required": ["confidence_score", "verification_result", "reasoning", "suggested_points", "key_observations"],
+        "propertyOrdering": [
+            "verification_result", "confidence_score", "suggested_points", "reasoning", "key_observations"
+        ],
+        "additionalProperties": False
+    }
+)
+
+# Same request for the escalation model; thinking tokens count against
+# max_output_tokens, so the cap grows by the thinking budget
+ESCALATION_CONFIG = VERIFICATION_CONFIG.model_copy(update={
+    "max_output_tokens": VERIFICATION_MAX_OUTPUT_TOKENS + ESCALATION_THINKING_BUDGET,
+    "thinking_config": types.ThinkingConfig(thinking_budget=ESCALATION_THINKING_BUDGET),
+})
+
+# Inline Batch API requests must total under 20MB; images are split across
+# jobs to stay below this
+BATCH_JOB_MAX_IMAGE_BYTES = 15 * 1024 * 1024
+
+
+async def run_image_task(func: Callable[..., Any], *args: Any) -> Any:
+    """Run CPU-bound Pillow work (func(*args)) on the image thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(_IMAGE_EXECUTOR, func, *args)
+
 
 class VisionVerifier:
     """
     AI agent that verifies quest completion using multimodal image analysis.
-    Uses Gemini 2.5 Pro Vision for understanding images and context.
+    Uses Gemini 2.5 Flash for understanding images and context, and
+    Gemini 2.5 Pro for the verdicts Flash is unsure about.
     """
     
     def __init__(self):
-        """Initialize the Vision Verifier with Gemini client"""
-        self.client = genai.Client()
-        self.model = "gemini-2.5-pro"  # Supports vision
+        """Initialize the Vision Verifier with the shared Gemini client"""
+        self.client = get_client()
+        self.primary_model = "gemini-2.5-flash"  # Supports vision; most proofs stop here
+        self.escalation_model = "gemini-2.5-pro"  # Re-checks ambiguous primary verdicts
+        self.text_model = "gemini-2.5-flash"  # Proofs without an image skip the vision path
+        
+        # Verdict label monitoring (see get_verdict_stats)
+        self._verdicts = 0
+        self._relabelled = 0
     
     async def verify_quest_proof(
         self,
-        image_path: str,
+        image_path: Optional[str],
         quest_title: str,
         quest_description: str,
         quest_category: str,
@@ -35,7 +219,8 @@ class VisionVerifier:
         Verify if an image proves quest completion.
         
         Args:
-            image_path: Path to the uploaded image file
+            image_path: Path to the uploaded image file (None, or an empty
+                        file, to judge the user's description alone)
             quest_title: Title of the quest
             quest_description: Full description of what needs to be done
             quest_category: Quest category (Environment, Social, etc.)
@@ -49,145 +234,419 @@ class VisionVerifier:
             - suggested_points (int): Points to award (0-100)
         """
         try:
-            # Read and encode image
-            with open(image_path, "rb") as img_file:
-                image_data = img_file.read()
-            
-            # Create verification prompt
-            prompt = self._create_verification_prompt(
+            key, image_data, prompt = await self._prepare(
+                image_path=image_path,
                 quest_title=quest_title,
                 quest_description=quest_description,
                 quest_category=quest_category,
                 user_description=user_description
             )
+            if (cached := self._cached(key)) is not None:
+                logger.debug("⚡ Verification cache hit: %s", quest_title)
+                return cached
             
-            print(f"🔍 Verifying quest proof with Gemini Vision...")
-            print(f"   Quest: {quest_title}")
-            print(f"   Category: {quest_category}")
+            model = self._model_for(image_data)
+            mime_type = None
+            if image_data:
+                image_data, mime_type = await run_image_task(self._downscale, image_data)
+            contents = self._contents(image_data, prompt, mime_type)
             
-            # Call Gemini with image
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=[
-                    types.Content(
-                        role="user",
-                        parts=[
-                            types.Part.from_bytes(
-                                data=image_data,
-                                mime_type="image/jpeg"
-                            ),
-                            types.Part.from_text(text=prompt)
-                        ]
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                   temperature=0.3,  # Lower temp for consistent evaluation
-                    response_mime_type="application/json",
-                    response_schema={
-                        "type": "object",
-                        "properties": {
-                            "confidence_score": {
-                                "type": "number",
-                                "description": "Confidence from 0.0 to 1.0 that the image proves quest completion"
-                            },
-                            "verification_result": {
-                                "type": "string",
-                                "enum": ["Verified", "Rejected", "Unclear"],
-                                "description": "Overall verification decision"
-                            },
-                            "reasoning": {
-                                "type": "string",
-                                "description": "Detailed explanation of the verification decision"
-                            },
-                            "suggested_points": {
-                                "type": "integer",
-                                "description": "Points to award from 0 to 100 based on impact and completion quality"
-                            },
-                            "key_observations": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "List of key things observed in the image"
-                            }
-                        },
-                        "required": ["confidence_score", "verification_result", "reasoning", "suggested_points"]
-                    }
+            logger.debug("🔍 Verifying quest proof with %s: %s (%s)", model, quest_title, quest_category)
+            
+            if image_data:
+                # Flash first; its stream is cut as soon as the verdict is
+                # either clear-cut or ambiguous enough to escalate anyway
+                result = await self._generate(
+                    model, contents,
+                    stop_early=lambda fields: self._decisive(fields) or self._ambiguous(fields)
                 )
+                if self._ambiguous(result):
+                    logger.debug("⬆️  Ambiguous verdict, escalating to %s", self.escalation_model)
+                    result = await self._generate(self.escalation_model, contents, stop_early=self._decisive)
+            else:
+                result = await self._generate(model, contents, stop_early=self._decisive)
+            
+            return self._remember(key, self._result(result))
+            
+        except Exception as e:
+            logger.warning("❌ Error in vision verification: %s", e)
+            return self._fallback(e)
+    
+    async def _generate(
+        self,
+        model: str,
+        contents: List[types.Content],
+        stop_early: Callable[[Dict[str, Any]], bool]
+    ) -> Dict[str, Any]:
+        """Stream one verdict from `model` (within the shared rate limit / in-flight cap)"""
+        tokens = approx_tokens(VERIFICATION_INSTRUCTION + contents[0].parts[-1].text)
+        if len(contents[0].parts) > 1:
+            tokens += IMAGE_TOKEN_ESTIMATE
+        
+        async with gemini_slot(model, tokens):
+            stream = await self.client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=ESCALATION_CONFIG if model == self.escalation_model else VERIFICATION_CONFIG
             )
+            return await stream_json_object(stream, DECISION_FIELDS, stop_early=stop_early)
+    
+    async def verify_batch(self, proofs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Verify several proofs concurrently; Gemini calls are still bounded by
+        the shared rate limit and in-flight cap (see gemini_client.gemini_slot)
+        
+        Args:
+            proofs: verify_quest_proof keyword arguments, one dict per proof
             
-            # Parse response
-            result = eval(response.text)  # JSON response
+        Returns:
+            verify_quest_proof results, in the same order as `proofs`
+        """
+        return await asyncio.gather(*(self.verify_quest_proof(**proof) for proof in proofs))
+    
+    async def verify_batch_job(self, proofs: List[Dict[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Verify proofs through the Gemini Batch API: half the price of
+        verify_batch, but jobs can take minutes to hours, so this is for
+        background backfills (see verify_pending_submissions.py), not requests
+        
+        Ambiguous primary-model verdicts are re-run on the escalation model in
+        a second round of jobs, as on the live path.
+        
+        Args:
+            proofs: verify_quest_proof keyword arguments, one dict per proof
             
-            print(f"✅ Verification complete:")
-            print(f"   Result: {result['verification_result']}")
-            print(f"   Confidence: {result['confidence_score']:.2%}")
-            print(f"   Points: {result['suggested_points']}")
+        Returns:
+            verify_quest_proof results, in the same order as `proofs`; None
+            for a proof that couldn't be verified (unreadable image, failed
+            or unparseable response), so callers can leave it for a later run
             
-            return {
-                "confidence_score": result["confidence_score"],
-                "verification_result": result["verification_result"],
-                "reasoning": result["reasoning"],
-                "suggested_points": result["suggested_points"],
-                "key_observations": result.get("key_observations", [])
-            }
+        Raises:
+            RuntimeError: If a batch job as a whole fails, so callers can
+                          leave the proofs for a later run
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(proofs)
+        requests_by_model: Dict[str, List[BatchItem]] = {}
+        
+        for i, proof in enumerate(proofs):
+            try:
+                key, image_data, prompt = await self._prepare(**proof)
+                if (cached := self._cached(key)) is not None:
+                    results[i] = cached
+                    continue
+                
+                model = self._model_for(image_data)
+                mime_type = None
+                if image_data:
+                    image_data, mime_type = await run_image_task(self._downscale, image_data)
+            except Exception as e:
+                logger.warning("❌ Can't read proof %s: %s", proof.get("image_path"), e)
+                continue
             
-        except Exception as e:
-            print(f"❌ Error in vision verification: {e}")
+            requests_by_model.setdefault(model, []).append((i, key, len(image_data), types.InlinedRequest(
+                contents=self._contents(image_data, prompt, mime_type),
+                config=VERIFICATION_CONFIG
+            )))
+        
+        escalations: List[BatchItem] = []
+        for _, item, outcome in await self._run_batch_jobs(requests_by_model):
+            i, key = item[0], item[1]
+            if isinstance(outcome, Exception):
+                logger.warning("❌ Error in vision verification: %s", outcome)
+            elif item[2] and self._ambiguous(outcome):  # Image proofs only, as on the live path
+                escalations.append(item)
+            else:
+                results[i] = self._remember(key, self._result(outcome))
+        
+        if escalations:
+            logger.info("⬆️  Escalating %d ambiguous proof(s) to %s", len(escalations), self.escalation_model)
+            escalations = [
+                (i, key, size, inlined.model_copy(update={"config": ESCALATION_CONFIG}))
+                for i, key, size, inlined in escalations
+            ]
+            for _, (i, key, _, _), outcome in await self._run_batch_jobs({self.escalation_model: escalations}):
+                if isinstance(outcome, Exception):
+                    logger.warning("❌ Error in vision verification: %s", outcome)
+                else:
+                    results[i] = self._remember(key, self._result(outcome))
+        
+        return results
+    
+    async def _run_batch_jobs(
+        self,
+        requests_by_model: Dict[str, List[BatchItem]]
+    ) -> List[Tuple[str, BatchItem, Any]]:
+        """
+        Run each model's requests as Batch API jobs of at most
+        BATCH_JOB_MAX_IMAGE_BYTES of images, all jobs concurrently
+        
+        Returns (model, item, parsed response or the Exception it failed with)
+        per request.
+        """
+        jobs: List[Tuple[str, List[BatchItem]]] = []
+        for model, items in requests_by_model.items():
+            job: List[BatchItem] = []
+            job_bytes = 0
+            for item in items:
+                if job and job_bytes + item[2] > BATCH_JOB_MAX_IMAGE_BYTES:
+                    jobs.append((model, job))
+                    job, job_bytes = [], 0
+                job.append(item)
+                job_bytes += item[2]
+            if job:
+                jobs.append((model, job))
+        
+        if not jobs:
+            return []
+        logger.info("📦 Verifying %d proof(s) in %d Gemini batch job(s)", sum(len(job) for _, job in jobs), len(jobs))
+        
+        job_responses = await asyncio.gather(
+            *(
+                run_batch_job(
+                    model,
+                    [item[3] for item in job],
+                    display_name=f"commupath-verify-{uuid.uuid4().hex[:8]}"
+                )
+                for model, job in jobs
+            )
+        )
+        
+        outcomes = []
+        for (model, job), responses in zip(jobs, job_responses):
+            for item, response in zip(job, responses):
+                try:
+                    if response is None or response.error or response.response is None:
+                        raise RuntimeError((response and response.error) or "no response from batch job")
+                    outcomes.append((model, item, orjson.loads(response.response.text)))
+                except Exception as e:
+                    outcomes.append((model, item, e))
+        return outcomes
+    
+    async def _prepare(
+        self,
+        image_path: Optional[str],
+        quest_title: str,
+        quest_description: str,
+        quest_category: str,
+        user_description: str = ""
+    ) -> Tuple[bytes, bytes, str]:
+        """
+        Read a proof's image and build its prompt; returns (cache key, image
+        bytes, prompt), with empty image bytes for a proof without an image
+        """
+        image_data = b""
+        if image_path:
+            async with aiofiles.open(image_path, "rb") as img_file:
+                image_data = await img_file.read()
+        
+        prompt = self._create_verification_prompt(
+            quest_title=quest_title,
+            quest_description=quest_description,
+            quest_category=quest_category,
+            user_description=user_description,
+            has_image=bool(image_data)
+        )
+        return self._cache_key(self._model_for(image_data), image_data, prompt), image_data, prompt
+    
+    def _model_for(self, image_data: bytes) -> str:
+        """Vision model for proofs with an image, the cheaper text model otherwise"""
+        return self.primary_model if image_data else self.text_model
+    
+    @staticmethod
+    def _downscale(image_data: bytes) -> Tuple[bytes, str]:
+        """
+        Re-encode an uploaded image as a JPEG within VISION_MAX_DIMENSION
+        (CPU-bound: run it with run_image_task). Images already small
+        enough in a format Gemini accepts are returned unchanged.
+        
+        Returns:
+            (image bytes, their MIME type, sniffed from the content)
             
-            # Fallback response
-            return {
-                "confidence_score": 0.0,
-                "verification_result": "Unclear",
-                "reasoning": f"Error during verification: {str(e)}. Please try again.",
-                "suggested_points": 0,
-                "key_observations": []
-            }
+        Raises:
+            ValueError: If Pillow can't decode the image, so the Gemini call
+                        is skipped rather than spent on an unreadable file
+        """
+        try:
+            # Every buffer and intermediate image is closed on the way out, so
+            # concurrent proofs don't hold decoded frames until GC
+            with io.BytesIO(image_data) as source, Image.open(source) as img:
+                if img.format in GEMINI_IMAGE_FORMATS and max(img.size) <= VISION_MAX_DIMENSION:
+                    return image_data, Image.MIME[img.format]
+                
+                # JPEGs decode straight at 1/2, 1/4 or 1/8 scale (still >= the
+                # target), skipping most of the full-resolution decode
+                img.draft("RGB", (VISION_MAX_DIMENSION, VISION_MAX_DIMENSION))
+                with ImageOps.exif_transpose(img) as upright:  # Keep phone photos upright once EXIF is dropped
+                    upright.thumbnail((VISION_MAX_DIMENSION, VISION_MAX_DIMENSION), Image.Resampling.LANCZOS)
+                    with upright.convert("RGB") as rgb, io.BytesIO() as buf:
+                        rgb.save(buf, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+                        return buf.getvalue(), "image/jpeg"
+        except Exception as e:
+            raise ValueError(f"Unreadable or unsupported image: {e}") from e
+    
+    @staticmethod
+    def image_hash(image_path: str) -> Optional[int]:
+        """
+        64-bit perceptual difference hash (dHash) of an image, as a signed
+        int so SQLite can store it (CPU-bound: run it with run_image_task)
+        
+        Each bit records whether a thumbnail pixel is brighter than its right
+        neighbour, so resaving, resizing or recompressing a photo flips few
+        or no bits. None if Pillow can't decode the image or the thumbnail
+        is too flat (IMAGE_HASH_MIN_CONTRAST) for the bits to mean anything.
+        """
+        size = IMAGE_HASH_SIZE
+        try:
+            with Image.open(image_path) as img:
+                img.draft("L", (size * 8, size * 8))  # JPEGs: decode at reduced scale
+                with img.convert("L") as gray, gray.resize((size + 1, size), Image.Resampling.LANCZOS) as thumb:
+                    pixels = list(thumb.getdata())
+        except Exception as e:
+            logger.warning("⚠️  Could not hash image %s: %s", image_path, e)
+            return None
+        
+        if max(pixels) - min(pixels) < IMAGE_HASH_MIN_CONTRAST:
+            return None
+        
+        bits = 0
+        for row in range(0, len(pixels), size + 1):
+            for left, right in zip(pixels[row:row + size], pixels[row + 1:row + size + 1]):
+                bits = (bits << 1) | (left > right)
+        return bits - (1 << 64) if bits >= 1 << 63 else bits
+    
+    @staticmethod
+    def _contents(image_data: bytes, prompt: str, mime_type: Optional[str] = None) -> List[types.Content]:
+        """Request contents: the image (if any) followed by the verification prompt"""
+        parts = []
+        if image_data:
+            parts.append(types.Part.from_bytes(data=image_data, mime_type=mime_type))
+        parts.append(types.Part.from_text(text=prompt))
+        return [types.Content(role="user", parts=parts)]
+    
+    @staticmethod
+    def _ambiguous(fields: Dict[str, Any]) -> bool:
+        """Whether a primary-model verdict should be re-checked by the escalation model"""
+        return (
+            fields["verification_result"] == "Unclear"
+            or ESCALATION_CONFIDENCE[0] <= fields["confidence_score"] <= ESCALATION_CONFIDENCE[1]
+        )
+    
+    @staticmethod
+    def _decisive(fields: Dict[str, Any]) -> bool:
+        """Whether the streamed decision is confident enough to stop reading"""
+        confidence = fields["confidence_score"]
+        return confidence <= EARLY_EXIT_MARGIN or confidence >= 1 - EARLY_EXIT_MARGIN
+    
+    @staticmethod
+    def _label_for(confidence: float) -> str:
+        """verification_result the instruction assigns to a confidence score"""
+        if confidence > VERIFIED_CONFIDENCE:
+            return "Verified"
+        if confidence < REJECTED_CONFIDENCE:
+            return "Rejected"
+        return "Unclear"
+    
+    def _result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Verification result from Gemini's parsed JSON response (possibly cut
+        after the decision), its label made consistent with its confidence
+        """
+        self._verdicts += 1
+        label = self._label_for(result["confidence_score"])
+        if result["verification_result"] != label:
+            self._relabelled += 1
+            logger.info(
+                "🔧 %s verdict at %.0f%% confidence relabelled %s",
+                result["verification_result"], result["confidence_score"] * 100, label
+            )
+            result = {**result, "verification_result": label}
+        
+        logger.info(
+            "✅ Verification complete: %s (confidence %.0f%%, %s points)",
+            result["verification_result"],
+            result["confidence_score"] * 100,
+            result["suggested_points"]
+        )
+        
+        return {
+            "confidence_score": result["confidence_score"],
+            "verification_result": result["verification_result"],
+            "reasoning": result.get("reasoning") or (
+                f"{result['verification_result']} with {result['confidence_score']:.0%} confidence."
+            ),
+            "suggested_points": result["suggested_points"],
+            "key_observations": result.get("key_observations", [])
+        }
+    
+    @staticmethod
+    def _fallback(error: Exception) -> Dict[str, Any]:
+        """Result returned when verification fails (never cached)"""
+        return {
+            "confidence_score": 0.0,
+            "verification_result": "Unclear",
+            "reasoning": f"Error during verification: {str(error)}. Please try again.",
+            "suggested_points": 0,
+            "key_observations": []
+        }
+    
+    @staticmethod
+    def _cache_key(model: str, image_data: bytes, prompt: str) -> bytes:
+        """blake2b of prompt version + model + prompt (quest and user text) + image"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{VERIFICATION_PROMPT_VERSION}\n{model}\n{prompt}\n".encode())
+        digest.update(image_data)
+        return digest.digest()
+    
+    @staticmethod
+    def _cached(key: bytes) -> Optional[Dict[str, Any]]:
+        entry = _VERIFICATION_CACHE.get(key)
+        if entry is None:
+            return None
+        expires_at, verification = entry
+        if expires_at <= time.monotonic():
+            del _VERIFICATION_CACHE[key]
+            return None
+        _VERIFICATION_CACHE.move_to_end(key)
+        return verification
+    
+    @staticmethod
+    def _remember(key: bytes, verification: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache a successful verification (error fallbacks are never cached)"""
+        _VERIFICATION_CACHE[key] = (time.monotonic() + VERIFICATION_CACHE_TTL_S, verification)
+        while len(_VERIFICATION_CACHE) > VERIFICATION_CACHE_SIZE:
+            _VERIFICATION_CACHE.popitem(last=False)
+        return verification
+    
+    def get_verdict_stats(self) -> Dict[str, Any]:
+        """Verdict statistics for monitoring (relabel_ratio is None before any verdict)"""
+        return {
+            "verdicts": self._verdicts,
+            "relabelled": self._relabelled,
+            "relabel_ratio": self._relabelled / self._verdicts if self._verdicts else None
+        }
     
     def _create_verification_prompt(
         self,
         quest_title: str,
         quest_description: str,
         quest_category: str,
-        user_description: str
+        user_description: str,
+        has_image: bool = True
     ) -> str:
-        """Create a detailed prompt for vision verification"""
+        """Quest-specific part of the verification prompt (instructions are in VERIFICATION_INSTRUCTION)"""
         
-        prompt = f"""You are an expert AI verifier for community impact quests. Your job is to analyze an image submission and determine if it genuinely proves the completion of a quest.
-
-**QUEST INFORMATION:**
+        prompt = f"""**QUEST INFORMATION:**
 - Title: {quest_title}
 - Description: {quest_description}
 - Category: {quest_category}
 
 **USER'S DESCRIPTION:**
 {user_description if user_description else "No description provided"}
-
-**YOUR TASK:**
-Carefully examine the image and evaluate the following:
-
-1. **Authenticity**: Does the image appear to be genuine (not AI-generated, not stock photo)?
-2. **Relevance**: Does the image directly relate to the quest objective?
-3. **Completion Evidence**: Does the image prove that the quest was actually completed?
-4. **Impact Quality**: Based on what you see, how significant is the community impact?
-5. **Safety & Appropriateness**: Is the content safe, appropriate, and aligned with positive community values?
-
-**VERIFICATION CRITERIA:**
-- ✅ **Verified** (confidence > 0.7): Clear evidence of quest completion with authentic, relevant proof
-- ⚠️  **Unclear** (confidence 0.3-0.7): Some evidence but missing key elements or unclear authenticity
-- ❌ **Rejected** (confidence < 0.3): No clear evidence, irrelevant image, or inappropriate content
-
-**POINTS CALCULATION:**
-- Exceptional impact with perfect evidence: 80-100 points
-- Good impact with solid evidence: 50-79 points
-- Moderate impact or partial evidence: 20-49 points
-- Minimal/unclear evidence: 0-19 points
-
-**IMPORTANT:**
-- Be encouraging but honest in your assessment
-- If unsure, provide constructive feedback on what's missing
-- Consider the quest category when evaluating impact
-- Reward genuine effort and authentic proof
-
-Provide your analysis in JSON format with confidence_score, verification_result, reasoning, suggested_points, and key_observations.
+"""
+        if not has_image:
+            prompt += """
+**NO IMAGE PROVIDED:**
+Judge the user's description alone; without photo evidence, don't return Verified unless the description itself clearly proves completion.
 """
         
         return prompt